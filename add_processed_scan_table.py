@@ -0,0 +1,18 @@
+"""
+Migration script to add the processed_scan table.
+
+/time/scan_batch records the id of every applied listener scan there and
+reports a scan whose id is already present as a duplicate, so a batch that
+is uploaded twice (e.g. after a timeout) is not applied twice.
+
+Safe to run more than once; an existing table is skipped. upgrade_db.py (and
+the gunicorn start-up) creates it together with the other new tables.
+"""
+from traveltogetherapp import create_app
+from traveltogetherapp.models import db, ProcessedScan
+
+app = create_app()
+
+with app.app_context():
+    ProcessedScan.__table__.create(db.engine, checkfirst=True)
+    print('Ensured table processed_scan.')
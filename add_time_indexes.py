@@ -0,0 +1,21 @@
+"""
+Migration script to add indexes for the time-tracking query shapes.
+
+- ix_time_entry_user_start: (user_id, start_time) for report range queries
+- uq_time_entry_running: unique partial index on running entries
+  (end_time IS NULL), so each user has at most one open entry
+- ix_user_rfid: unique index on user.rfid for RFID scans
+
+Safe to run more than once; existing indexes are skipped. Creating
+uq_time_entry_running fails if a user already has several running entries;
+stop the extra ones and run the script again. upgrade_db.py (and the
+gunicorn start-up) runs the same step.
+"""
+from traveltogetherapp import create_app
+from traveltogetherapp.schema import ensure_indexes
+
+app = create_app()
+
+with app.app_context():
+    for name in ensure_indexes():
+        print(f'Ensured index {name}.')
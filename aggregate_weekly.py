@@ -1,76 +1,230 @@
+"""
+Write weekly time reports (CSV) per user and combined for all users.
+
+Usage:
+  python aggregate_weekly.py                           # last calendar week
+  python aggregate_weekly.py --week 2026-W41 --week 2026-W42
+  python aggregate_weekly.py --from 2026-01-01 --to 2026-12-31
+  python aggregate_weekly.py --from 2026-01-01 --workers 8              # parallel backfill
+  python aggregate_weekly.py --week 2026-W41 --workers 4 --shard user  # split one week by user
+
+Each week is read with one query over the DailyTotal rollup (joined with the
+users, ordered by user) that is streamed in chunks, and rows are written to
+the per-user and combined files as they arrive, so memory stays flat however
+many users there are.
+
+With --workers the weeks (or, with --shard user, contiguous ranges of user
+ids within each week) are computed in a process pool, each worker with its
+own app and database connection. Shard outputs are merged in a fixed order,
+so the files are identical to a serial run.
+"""
 from traveltogetherapp import create_app
-from traveltogetherapp.models import db, User, TimeEntry
+from traveltogetherapp.models import db, User, TimeEntry, DailyTotal
+from traveltogetherapp.aggregation import daily_totals, day_start
 from datetime import date, datetime, timedelta
+from itertools import groupby
+from concurrent.futures import ProcessPoolExecutor
+import argparse
 import csv
 import os
-
-app = create_app()
+import shutil
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
-os.makedirs(DATA_DIR, exist_ok=True)
-
-with app.app_context():
-    today = date.today()
-    # Last calendar week Monday-Sunday
-    last_monday = today - timedelta(days=today.weekday() + 7)
-    week_dates = [last_monday + timedelta(days=i) for i in range(7)]
-    week_label = f"{last_monday.isocalendar()[0]}-W{last_monday.isocalendar()[1]}"
-
-    users = db.session.execute(db.select(User)).scalars().all()
-
-    combined_rows = []
-
-    for user in users:
-        per_day = []
-        week_total_seconds = 0
-        for d in week_dates:
-            day_start = datetime(d.year, d.month, d.day)
-            day_end = day_start + timedelta(days=1)
-
-            q = db.select(TimeEntry).where(
-                TimeEntry.user_id == user.id,
-                TimeEntry.start_time < day_end,
-                (TimeEntry.end_time == None) | (TimeEntry.end_time >= day_start),
-            )
-            entries = db.session.execute(q).scalars().all()
-            seconds = 0
-            for e in entries:
-                s = e.start_time
-                en = e.end_time or datetime.utcnow()
-                if s < day_start:
-                    s = day_start
-                if en > day_end:
-                    en = day_end
-                delta = en - s
-                secs = int(delta.total_seconds())
-                seconds += secs
-
-            hours = seconds // 3600
-            rem_minutes = (seconds % 3600) // 60
-            rem_seconds = seconds % 60
-            per_day.append((d.isoformat(), d.strftime('%A'), hours, rem_minutes, rem_seconds, seconds))
-            week_total_seconds += seconds
-
-        # Write per-user CSV
-        filename = os.path.join(DATA_DIR, f"weekly_report_{user.id}_{week_label}.csv")
-        with open(filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['date', 'weekday', 'hours', 'minutes', 'seconds', 'total_seconds'])
-            for row in per_day:
-                writer.writerow(row)
-            writer.writerow([])
-            writer.writerow(['TOTAL', '', week_total_seconds // 3600, (week_total_seconds % 3600)//60, week_total_seconds % 60, week_total_seconds])
-
-        combined_rows.append((user, per_day, week_total_seconds))
-
-    # Optionally write combined file
-    combined_file = os.path.join(DATA_DIR, f"weekly_report_all_{week_label}.csv")
-    with open(combined_file, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(['user_id', 'user_email', 'date', 'weekday', 'hours', 'minutes', 'seconds', 'total_seconds'])
-        for user, per_day, week_total_seconds in combined_rows:
+STREAM_CHUNK = 1000
+
+
+def week_label(monday):
+    iso = monday.isocalendar()
+    return f"{iso[0]}-W{iso[1]}"
+
+
+def parse_iso_week(label):
+    """Return the Monday of an ISO week label like '2026-W41'."""
+    year, week = label.upper().split('-W')
+    return date.fromisocalendar(int(year), int(week), 1)
+
+
+def weeks_between(start, end):
+    """Mondays of every calendar week overlapping start..end (inclusive)."""
+    monday = start - timedelta(days=start.weekday())
+    weeks = []
+    while monday <= end:
+        weeks.append(monday)
+        monday += timedelta(days=7)
+    return weeks
+
+
+def _day_row(day):
+    seconds = day.seconds
+    d = day.date
+    return (d.isoformat(), d.strftime('%A'), seconds // 3600, (seconds % 3600) // 60, seconds % 60, seconds)
+
+
+def write_week(monday, data_dir=DATA_DIR, user_ids=None, combined_file=None):
+    """Write the per-user and combined CSV files for the week starting ``monday``.
+
+    user_ids restricts the report to some users (None means everyone).
+    combined_file overrides where the combined rows go (used for shards).
+    Returns the path of the combined file.
+    """
+    week_end = monday + timedelta(days=6)
+    label = week_label(monday)
+    now = datetime.utcnow()
+
+    # Running entries are few; compute them live per user
+    running_q = db.select(TimeEntry.user_id, TimeEntry.start_time, TimeEntry.end_time).where(
+        TimeEntry.end_time == None,
+        TimeEntry.start_time < day_start(week_end) + timedelta(days=1),
+    )
+    # One windowed query for the week, streamed in chunks, ordered by user
+    q = (
+        db.select(User.id.label('user_id'), User.email, DailyTotal.date, DailyTotal.seconds)
+        .outerjoin(DailyTotal, (DailyTotal.user_id == User.id) & (DailyTotal.date >= monday) & (DailyTotal.date <= week_end))
+        .order_by(User.id)
+        .execution_options(yield_per=STREAM_CHUNK)
+    )
+    if user_ids is not None:
+        running_q = running_q.where(TimeEntry.user_id.in_(user_ids))
+        q = q.where(User.id.in_(user_ids))
+    running = {}
+    for e in db.session.execute(running_q):
+        running.setdefault(e.user_id, []).append(e)
+
+    combined_file = combined_file or os.path.join(data_dir, f"weekly_report_all_{label}.csv")
+    with open(combined_file, 'w', newline='', encoding='utf-8') as cf:
+        combined = csv.writer(cf)
+        combined.writerow(['user_id', 'user_email', 'date', 'weekday', 'hours', 'minutes', 'seconds', 'total_seconds'])
+        for user_id, rows in groupby(db.session.execute(q), key=lambda r: r.user_id):
+            rows = list(rows)
+            email = rows[0].email
+            base = [r for r in rows if r.date is not None]
+            days = daily_totals(running.get(user_id, []), monday, week_end,
+                                user_ids=[user_id], now=now, base=base)[user_id]
+            per_day = [_day_row(day) for day in days]
+            week_total_seconds = sum(day.seconds for day in days)
+            total_row = ['TOTAL', '', week_total_seconds // 3600, (week_total_seconds % 3600)//60, week_total_seconds % 60, week_total_seconds]
+
+            # Write per-user CSV
+            filename = os.path.join(data_dir, f"weekly_report_{user_id}_{label}.csv")
+            with open(filename, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['date', 'weekday', 'hours', 'minutes', 'seconds', 'total_seconds'])
+                for row in per_day:
+                    writer.writerow(row)
+                writer.writerow([])
+                writer.writerow(total_row)
+
             for row in per_day:
-                writer.writerow([user.id, user.email] + list(row))
-            writer.writerow([user.id, user.email, 'TOTAL', '', week_total_seconds // 3600, (week_total_seconds % 3600)//60, week_total_seconds % 60, week_total_seconds])
+                combined.writerow([user_id, email] + list(row))
+            combined.writerow([user_id, email] + total_row)
+    return combined_file
+
+
+# --- Parallel backfill ---------------------------------------------------
+
+_worker_app = None
+
+
+def _init_worker():
+    """Give each pool process its own app and therefore its own DB connection pool."""
+    global _worker_app
+    _worker_app = create_app()
+
+
+def _week_job(monday, data_dir):
+    with _worker_app.app_context():
+        return write_week(monday, data_dir)
+
+
+def _shard_job(monday, data_dir, user_ids, part):
+    with _worker_app.app_context():
+        part_file = os.path.join(data_dir, f".weekly_report_all_{week_label(monday)}.part{part:03d}.csv")
+        return write_week(monday, data_dir, user_ids, combined_file=part_file)
+
+
+def _merge_parts(target, parts):
+    """Concatenate shard files in order, keeping only the first header."""
+    with open(target, 'w', newline='', encoding='utf-8') as out:
+        for i, part in enumerate(parts):
+            with open(part, 'r', newline='', encoding='utf-8') as f:
+                header = f.readline()
+                if i == 0:
+                    out.write(header)
+                shutil.copyfileobj(f, out)
+            os.remove(part)
+
+
+def run_parallel(weeks, data_dir, workers, shard='week'):
+    """Compute the given weeks in a process pool and return the combined file paths."""
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        if shard == 'week':
+            futures = [pool.submit(_week_job, monday, data_dir) for monday in weeks]
+            return [f.result() for f in futures]
+
+        # shard == 'user': contiguous id ranges keep the merged file in user order
+        app = create_app()
+        with app.app_context():
+            ids = list(db.session.execute(db.select(User.id).order_by(User.id)).scalars())
+        size = max(1, -(-len(ids) // workers))
+        chunks = [ids[i:i + size] for i in range(0, len(ids), size)] or [[]]
+        jobs = [
+            (monday, [pool.submit(_shard_job, monday, data_dir, chunk, n) for n, chunk in enumerate(chunks)])
+            for monday in weeks
+        ]
+        combined = []
+        for monday, futures in jobs:
+            target = os.path.join(data_dir, f"weekly_report_all_{week_label(monday)}.csv")
+            _merge_parts(target, [f.result() for f in futures])
+            combined.append(target)
+        return combined
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Write weekly time reports as CSV')
+    parser.add_argument('--week', action='append', default=[], metavar='YYYY-Www',
+                        help='ISO week to report (repeatable)')
+    parser.add_argument('--from', dest='date_from', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                        help='Report every week overlapping this date range (with --to)')
+    parser.add_argument('--to', dest='date_to', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                        help='End of the date range (default: today)')
+    parser.add_argument('--out', default=DATA_DIR, help='Output directory (default: data/)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes for backfills (0 = one per CPU core, default: 1)')
+    parser.add_argument('--shard', choices=['week', 'user'], default='week',
+                        help='Split work by week (default) or by user ranges within each week')
+    return parser.parse_args(argv)
+
+
+def selected_weeks(args):
+    """Mondays of the weeks requested on the command line (default: last week)."""
+    weeks = [parse_iso_week(w) for w in args.week]
+    if args.date_from:
+        weeks += weeks_between(args.date_from, args.date_to or date.today())
+    if not weeks:
+        today = date.today()
+        # Last calendar week Monday-Sunday
+        weeks = [today - timedelta(days=today.weekday() + 7)]
+    return sorted(set(weeks))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.makedirs(args.out, exist_ok=True)
+    weeks = selected_weeks(args)
+    workers = args.workers or os.cpu_count() or 1
+    if workers > 1:
+        for monday, _ in zip(weeks, run_parallel(weeks, args.out, workers, args.shard)):
+            print(f'Week {week_label(monday)} written')
+        print('Weekly reports written to', args.out)
+        return
+
+    app = create_app()
+    with app.app_context():
+        for monday in weeks:
+            write_week(monday, args.out)
+            print(f'Week {week_label(monday)} written')
+    print('Weekly reports written to', args.out)
+
 
-    print('Weekly reports written to', DATA_DIR)
+if __name__ == '__main__':
+    main()
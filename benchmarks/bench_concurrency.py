@@ -0,0 +1,148 @@
+"""
+Benchmark mixed read/write throughput: report pages being read while RFID
+scans write, with SQLite's defaults versus the tuned engine settings.
+
+Usage:
+  python benchmarks/bench_concurrency.py --readers 4 --writers 4 --seconds 10
+  python benchmarks/bench_concurrency.py --modes tuned     # only the configured settings
+
+Each mode seeds its own throwaway SQLite database, then runs reader threads
+(GET /timelogs and /timelogs/<id> as an editor) and writer threads (POST
+/time/toggle_by_rfid with random cards) against the app in-process for a
+fixed time, and reports requests/s, p50/p95 latency, server errors (5xx)
+and conflicts (409: two scans of the same card raced, the loser is refused).
+  default: journal_mode=DELETE, synchronous=FULL, no mmap, default cache
+  tuned:   the SQLITE_* settings from config.py (WAL, NORMAL, ...)
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config
+
+MODES = {
+    'default': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL',
+                'SQLITE_MMAP_SIZE': 0, 'SQLITE_CACHE_SIZE': -2000},
+    'tuned': {},
+}
+
+
+def make_app(db_path, overrides):
+    saved = {key: getattr(Config, key) for key in list(overrides) + ['SQLALCHEMY_DATABASE_URI']}
+    for key, value in overrides.items():
+        setattr(Config, key, value)
+    Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+    try:
+        from traveltogetherapp import create_app
+        return create_app()
+    finally:
+        for key, value in saved.items():
+            setattr(Config, key, value)
+
+
+def seed(app, n_users, days):
+    from traveltogetherapp.models import db, User, TimeEntry
+    from traveltogetherapp.rollup import rebuild
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(email='editor@example.com', password='x', role='editor'))
+        db.session.execute(db.insert(User), [
+            {'email': f'scan{i}@example.com', 'password': 'x', 'role': 'editor', 'rfid': f'CARD{i:05d}'}
+            for i in range(n_users)
+        ])
+        today = datetime.utcnow().replace(hour=7, minute=0, second=0, microsecond=0)
+        db.session.execute(db.insert(TimeEntry), [
+            {'user_id': uid, 'start_time': today - timedelta(days=d), 'end_time': today - timedelta(days=d, hours=-8)}
+            for uid in range(2, n_users + 2) for d in range(1, days + 1)
+        ])
+        db.session.commit()
+        rebuild()
+        # Login id for the session (user id + session version)
+        return db.session.execute(db.select(User).where(User.email == 'editor@example.com')).scalar_one().get_id()
+
+
+def run_mode(name, args):
+    tmp_dir = tempfile.TemporaryDirectory(prefix=f'bench-{name}-')
+    app = make_app(os.path.join(tmp_dir.name, 'bench.db'), MODES[name])
+    try:
+        editor_login = seed(app, args.users, args.days)
+        samples = {'read': [], 'write': []}
+        errors = {'read': 0, 'write': 0}
+        conflicts = {'read': 0, 'write': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + args.seconds
+
+        def worker(kind, seed_value):
+            rng = random.Random(seed_value)
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session['_user_id'] = editor_login
+                session['_fresh'] = True
+            local, failed, raced = [], 0, 0
+            while time.perf_counter() < deadline:
+                t0 = time.perf_counter()
+                if kind == 'read':
+                    if rng.random() < 0.5:
+                        resp = client.get('/timelogs')
+                    else:
+                        resp = client.get(f'/timelogs/{rng.randint(2, args.users + 1)}')
+                else:
+                    resp = client.post('/time/toggle_by_rfid', json={'rfid': f'CARD{rng.randrange(args.users):05d}'})
+                local.append((time.perf_counter() - t0) * 1000)
+                if resp.status_code >= 500:
+                    failed += 1
+                elif resp.status_code == 409:
+                    raced += 1
+            with lock:
+                samples[kind].extend(local)
+                errors[kind] += failed
+                conflicts[kind] += raced
+
+        threads = [threading.Thread(target=worker, args=('read', i)) for i in range(args.readers)]
+        threads += [threading.Thread(target=worker, args=('write', 1000 + i)) for i in range(args.writers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        results = {}
+        for kind, values in samples.items():
+            values.sort()
+            if values:
+                results[kind] = (len(values) / args.seconds, statistics.median(values),
+                                 values[max(int(len(values) * 0.95) - 1, 0)], errors[kind], conflicts[kind])
+            else:
+                results[kind] = (0.0, 0.0, 0.0, errors[kind], conflicts[kind])
+        return results
+    finally:
+        tmp_dir.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mixed read/write throughput benchmark')
+    parser.add_argument('--readers', type=int, default=4, help='Threads reading report pages')
+    parser.add_argument('--writers', type=int, default=4, help='Threads posting RFID scans')
+    parser.add_argument('--seconds', type=float, default=10, help='Duration per mode')
+    parser.add_argument('--users', type=int, default=50, help='Users (cards) to seed')
+    parser.add_argument('--days', type=int, default=60, help='Days of history per user')
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    args = parser.parse_args()
+
+    print(f'{args.readers} readers / {args.writers} writers, {args.seconds:g}s per mode')
+    print(f"{'mode':<10}{'kind':<7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}{'409s':>7}")
+    for name in args.modes:
+        for kind, (rate, p50, p95, failed, raced) in run_mode(name, args).items():
+            print(f'{name:<10}{kind:<7}{rate:>9.1f}{p50:>9.2f}{p95:>9.2f}{failed:>8}{raced:>7}')
+
+
+if __name__ == '__main__':
+    main()
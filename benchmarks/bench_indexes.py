@@ -0,0 +1,137 @@
+"""
+Benchmark lookup latency for the time-tracking query shapes with and
+without the indexes declared on the models.
+
+Usage:
+  python benchmarks/bench_indexes.py --entries 1000000 --users 500
+
+Seeds a throwaway SQLite database (or DATABASE_URL if given) with the
+requested number of TimeEntry rows, then times:
+  - RFID -> user lookup
+  - running timer lookup (user_id = ? AND end_time IS NULL)
+  - one week of entries for a user (report range query)
+first with the indexes dropped, then with them created.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def seed(db, User, TimeEntry, n_users, n_entries):
+    """Insert users and closed entries in bulk, plus one running entry per user."""
+    db.session.execute(db.insert(User), [
+        {'email': f'bench{i}@example.com', 'password': 'x', 'role': 'user', 'rfid': f'RFID{i:06d}'}
+        for i in range(1, n_users + 1)
+    ])
+    now = datetime.utcnow()
+    per_user = max(n_entries // n_users, 1)
+    batch = []
+    for uid in range(1, n_users + 1):
+        start = now - timedelta(hours=per_user * 12)
+        for _ in range(per_user):
+            end = start + timedelta(hours=8)
+            batch.append({'user_id': uid, 'start_time': start, 'end_time': end, 'duration_minutes': 480})
+            start += timedelta(hours=12)
+            if len(batch) >= 50000:
+                db.session.execute(db.insert(TimeEntry), batch)
+                batch = []
+        batch.append({'user_id': uid, 'start_time': now, 'end_time': None})
+    if batch:
+        db.session.execute(db.insert(TimeEntry), batch)
+    db.session.commit()
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def run_queries(db, User, TimeEntry, n_users, repeat):
+    rng = random.Random(42)
+    week_start = datetime.utcnow() - timedelta(days=30)
+
+    def rfid_lookup():
+        rfid = f'RFID{rng.randint(1, n_users):06d}'
+        db.session.execute(db.select(User.id).where(User.rfid == rfid)).scalar_one_or_none()
+
+    def running_lookup():
+        uid = rng.randint(1, n_users)
+        db.session.execute(
+            db.select(TimeEntry.id).where(TimeEntry.user_id == uid, TimeEntry.end_time == None)
+        ).scalar_one_or_none()
+
+    def week_range():
+        uid = rng.randint(1, n_users)
+        db.session.execute(
+            db.select(TimeEntry.start_time, TimeEntry.end_time).where(
+                TimeEntry.user_id == uid,
+                TimeEntry.start_time >= week_start,
+                TimeEntry.start_time < week_start + timedelta(days=7),
+            )
+        ).all()
+
+    return {
+        'rfid lookup': timed(rfid_lookup, repeat),
+        'running timer lookup': timed(running_lookup, repeat),
+        'week range query': timed(week_range, repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index benchmark for TimeEntry/User lookups')
+    parser.add_argument('--entries', type=int, default=1000000, help='TimeEntry rows to seed')
+    parser.add_argument('--users', type=int, default=500, help='Users to seed')
+    parser.add_argument('--repeat', type=int, default=50, help='Queries per measurement')
+    args = parser.parse_args()
+
+    tmp_dir = None
+    if not os.environ.get('DATABASE_URL'):
+        tmp_dir = tempfile.TemporaryDirectory(prefix='bench-indexes-')
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp_dir.name, 'bench.db')}"
+
+    from traveltogetherapp import create_app
+    from traveltogetherapp.models import db, User, TimeEntry
+
+    app = create_app()
+    try:
+        with app.app_context():
+            db.create_all()
+            print(f'Seeding {args.users} users / {args.entries} entries...')
+            t0 = time.perf_counter()
+            seed(db, User, TimeEntry, args.users, args.entries)
+            print(f'Seeded in {time.perf_counter() - t0:.1f}s')
+
+            indexes = list(TimeEntry.__table__.indexes) + list(User.__table__.indexes)
+            for index in indexes:
+                index.drop(db.engine, checkfirst=True)
+            db.session.commit()
+            without = run_queries(db, User, TimeEntry, args.users, args.repeat)
+
+            for index in indexes:
+                index.create(db.engine, checkfirst=True)
+            db.session.commit()
+            with_idx = run_queries(db, User, TimeEntry, args.users, args.repeat)
+
+            print(f"\n{'query':<24}{'no index p50/p95 ms':>24}{'indexed p50/p95 ms':>24}")
+            for name in without:
+                a, b = without[name], with_idx[name]
+                print(f'{name:<24}{a[0]:>12.3f}/{a[1]:<11.3f}{b[0]:>12.3f}/{b[1]:<11.3f}')
+    finally:
+        if tmp_dir:
+            tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark login throughput per password-hash cost, and what a login burst
+does to RFID scan latency at the same time.
+
+Usage:
+  python benchmarks/bench_passwords.py
+  python benchmarks/bench_passwords.py --methods pbkdf2:sha256:600000 scrypt:32768:8:1 --logins 8
+  python benchmarks/bench_passwords.py --pool process --workers 2
+
+For each method a throwaway SQLite database gets one user whose password is
+hashed with that method. --logins threads then POST /login for --seconds
+while one thread keeps scanning a card (POST /time/toggle_by_rfid).
+Reported per method: time of a single hash, logins/s with p50/p95 latency,
+refused logins (503, hash pool busy) and scan p50/p95 during the burst.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config
+
+DEFAULT_METHODS = ('pbkdf2:sha256:100000', 'pbkdf2:sha256:600000', 'scrypt:16384:8:1', 'scrypt:32768:8:1')
+PASSWORD = 'bench-password'
+
+
+def make_app(db_path, overrides):
+    saved = {key: getattr(Config, key) for key in list(overrides) + ['SQLALCHEMY_DATABASE_URI']}
+    for key, value in overrides.items():
+        setattr(Config, key, value)
+    Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+    try:
+        from traveltogetherapp import create_app
+        app = create_app()
+        # login redirects to the main page, which app.py registers
+        app.add_url_rule('/main', 'main_page', lambda: '')
+        return app
+    finally:
+        for key, value in saved.items():
+            setattr(Config, key, value)
+
+
+def p(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q / 100))] if values else 0.0
+
+
+def run_method(method, args):
+    from traveltogetherapp.models import db, User
+    from traveltogetherapp.passwords import password_hasher
+
+    tmp_dir = tempfile.TemporaryDirectory(prefix='bench-passwords-')
+    app = make_app(os.path.join(tmp_dir.name, 'bench.db'), {'PASSWORD_HASH_METHOD': method, 'PASSWORD_HASH_WORKERS': args.workers,
+                             'PASSWORD_HASH_POOL': args.pool})
+    try:
+        with app.app_context():
+            db.create_all()
+            t0 = time.perf_counter()
+            stored = password_hasher.hash(PASSWORD)
+            single = (time.perf_counter() - t0) * 1000
+            db.session.add(User(email='login@example.com', password=stored, role='user'))
+            db.session.add(User(email='scan@example.com', password='x', role='user', rfid='SCANBENCH'))
+            db.session.commit()
+            password_hasher.needs_rehash(stored)  # learn the method prefix before timing
+
+        deadline = time.perf_counter() + args.seconds
+        logins, scans = [], []
+        refused = [0]
+        lock = threading.Lock()
+
+        def login_loop():
+            client = app.test_client()
+            mine, busy = [], 0
+            while time.perf_counter() < deadline:
+                t0 = time.perf_counter()
+                resp = client.post('/login', data={'email': 'login@example.com', 'password': PASSWORD})
+                if resp.status_code == 503:
+                    busy += 1
+                elif resp.status_code != 302:
+                    raise RuntimeError(f'login failed: {resp.status_code}')
+                else:
+                    mine.append((time.perf_counter() - t0) * 1000)
+                client.get('/logout')
+            with lock:
+                logins.extend(mine)
+                refused[0] += busy
+
+        def scan_loop():
+            client = app.test_client()
+            while time.perf_counter() < deadline:
+                t0 = time.perf_counter()
+                client.post('/time/toggle_by_rfid', json={'rfid': 'SCANBENCH'})
+                scans.append((time.perf_counter() - t0) * 1000)
+                time.sleep(0.01)
+
+        threads = [threading.Thread(target=login_loop) for _ in range(args.logins)]
+        threads.append(threading.Thread(target=scan_loop))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return {
+            'hash ms': single,
+            'logins/s': len(logins) / args.seconds,
+            'login p50': p(logins, 50), 'login p95': p(logins, 95),
+            'refused': refused[0],
+            'scan p50': p(scans, 50), 'scan p95': p(scans, 95),
+        }
+    finally:
+        password_hasher.shutdown()
+        tmp_dir.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Login throughput per password-hash cost')
+    parser.add_argument('--methods', nargs='+', default=list(DEFAULT_METHODS), help='Werkzeug hash methods')
+    parser.add_argument('--logins', type=int, default=8, help='Concurrent login threads')
+    parser.add_argument('--seconds', type=float, default=5, help='Duration per method')
+    parser.add_argument('--workers', type=int, default=2, help='PASSWORD_HASH_WORKERS')
+    parser.add_argument('--pool', choices=['thread', 'process'], default='thread', help='PASSWORD_HASH_POOL')
+    args = parser.parse_args()
+
+    print(f'{args.logins} login threads + 1 scanner, {args.seconds:g}s per method, '
+          f'{args.workers} {args.pool} hash workers')
+    columns = ('hash ms', 'logins/s', 'login p50', 'login p95', 'refused', 'scan p50', 'scan p95')
+    print(f"{'method':<24}" + ''.join(f'{c:>11}' for c in columns))
+    for method in args.methods:
+        r = run_method(method, args)
+        print(f'{method:<24}' + ''.join(f'{r[c]:>11.1f}' if isinstance(r[c], float) else f'{r[c]:>11}'
+                                        for c in columns))
+
+
+if __name__ == '__main__':
+    main()
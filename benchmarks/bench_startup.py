@@ -0,0 +1,149 @@
+"""
+Benchmark cold start: from launching the server process to the first
+answered badge scan, as on a scale-to-zero machine woken by a request.
+
+Usage:
+  python benchmarks/bench_startup.py --runs 5
+  python benchmarks/bench_startup.py --server flask          # dev server, for comparison
+  python benchmarks/bench_startup.py --cold-bytecode         # no .pyc available (image without compileall)
+  python benchmarks/bench_startup.py --profile               # slowest imports of the app
+
+Each run starts the server on a free port against a throwaway SQLite
+database and measures:
+  - listening:      process start until the port accepts connections
+  - first scan:     process start until POST /time/toggle_by_rfid is answered
+  - first latency:  time the first scan itself took once the port was open
+  - warm latency:   a second scan, for comparison
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+BENCH_RFID = 'BENCHSTART1'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def seed(db_url):
+    os.environ['DATABASE_URL'] = db_url
+    from traveltogetherapp import create_app
+    from traveltogetherapp.models import db, User
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(email='start@example.com', password='x', role='user', rfid=BENCH_RFID))
+        db.session.commit()
+
+
+def server_command(server, port):
+    if server == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}']
+    return [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(port)]
+
+
+def scan(port):
+    req = urllib.request.Request(
+        f'http://127.0.0.1:{port}/time/toggle_by_rfid',
+        data=json.dumps({'rfid': BENCH_RFID}).encode(),
+        headers={'Content-Type': 'application/json'},
+    )
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        resp.read()
+        return resp.status
+
+
+def one_run(server, db_url, workers, cold_bytecode, timeout=60):
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=db_url, WEB_CONCURRENCY=str(workers))
+    pycache = None
+    if cold_bytecode:
+        pycache = tempfile.mkdtemp(prefix='bench-pycache-')
+        env['PYTHONPYCACHEPREFIX'] = pycache
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(server_command(server, port), cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f'{server} exited with code {proc.returncode}')
+            if time.perf_counter() - t0 > timeout:
+                raise RuntimeError(f'{server} did not listen within {timeout}s')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+                break
+            except OSError:
+                time.sleep(0.005)
+        listening = time.perf_counter() - t0
+        scan(port)
+        first = time.perf_counter() - t0
+        t1 = time.perf_counter()
+        scan(port)
+        warm = time.perf_counter() - t1
+        return {'listening': listening * 1000, 'first scan': first * 1000,
+                'first latency': (first - listening) * 1000, 'warm latency': warm * 1000}
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        if pycache:
+            subprocess.run(['rm', '-rf', pycache])
+
+
+def import_profile(top):
+    """Print the slowest imports (cumulative) of the app module."""
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT,
+                         capture_output=True, text=True, env=dict(os.environ, DATABASE_URL='sqlite://')).stderr
+    rows = []
+    for line in out.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cum, name = line.split('|')
+        rows.append((int(cum), int(own.split(':')[1]), name))
+    total = max(rows)[0] if rows else 0
+    print(f'\nImporting the app: {total / 1000:.0f} ms. Slowest imports (cumulative / self ms):')
+    for cum, own, name in sorted(rows, reverse=True)[:top]:
+        print(f'  {cum / 1000:>8.1f} {own / 1000:>8.1f}  {name.strip()}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start benchmark for the web server')
+    parser.add_argument('--runs', type=int, default=5, help='Server starts to measure')
+    parser.add_argument('--server', choices=['gunicorn', 'flask'], default='gunicorn')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn workers (default: 1)')
+    parser.add_argument('--cold-bytecode', action='store_true', help='Start without any cached .pyc files')
+    parser.add_argument('--profile', action='store_true', help='Also print the slowest imports')
+    parser.add_argument('--top', type=int, default=15, help='Imports shown with --profile')
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.TemporaryDirectory(prefix='bench-startup-')
+    db_url = f"sqlite:///{os.path.join(tmp_dir.name, 'bench.db')}"
+    try:
+        seed(db_url)
+        results = [one_run(args.server, db_url, args.workers, args.cold_bytecode) for _ in range(args.runs)]
+        print(f'{args.server}, {args.runs} runs{" (cold bytecode)" if args.cold_bytecode else ""}')
+        print(f"{'':<16}{'p50 ms':>10}{'max ms':>10}")
+        for key in results[0]:
+            samples = [r[key] for r in results]
+            print(f'{key:<16}{statistics.median(samples):>10.1f}{max(samples):>10.1f}')
+        if args.profile:
+            import_profile(args.top)
+    finally:
+        tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
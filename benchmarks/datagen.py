@@ -0,0 +1,113 @@
+"""
+Synthetic data for the time-tracking benchmarks.
+
+Usage:
+  python benchmarks/datagen.py --users 200 --entries 1000 --years 2   # seeds DATABASE_URL
+
+Generates users with RFID cards (a few editors), then for every user about
+``entries`` time entries spread over the working days of the last ``years``
+years: stints starting in the morning (several a day when there are more
+entries than working days), now and then a weekend day or a shift across
+midnight. Some users have a timer running and
+some days carry a manual adjustment. The DailyTotal rollup is rebuilt at the
+end, as rebuild_daily_totals.py would. The same seed gives the same data.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+INSERT_CHUNK = 20000
+EDITOR_EVERY = 10  # every 10th user is an editor
+
+
+def card(i):
+    return f'BENCH{i:06d}'
+
+
+def generate(db, users=200, entries=1000, years=1.0, seed=42, running_share=0.2, now=None):
+    """Insert the synthetic data set into an empty database. Returns row counts."""
+    from traveltogetherapp.models import User, TimeEntry, DailyAdjustment
+    from traveltogetherapp.rollup import rebuild
+
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+    db.session.execute(db.insert(User), [
+        {'email': f'bench{i}@example.com', 'password': 'x', 'alias': f'Bench {i}',
+         'role': 'editor' if i % EDITOR_EVERY == 0 else 'user', 'rfid': card(i)}
+        for i in range(users)
+    ])
+    ids = [row.id for row in db.session.execute(db.select(User.id, User.email).order_by(User.id))
+           if row.email.startswith('bench')]
+
+    first_day = (now - timedelta(days=int(365 * years))).date()
+    days = [first_day + timedelta(days=n) for n in range((now.date() - first_day).days)]
+    workdays = [d for d in days if d.weekday() < 5] or days
+    counts = {'users': len(ids), 'entries': 0, 'adjustments': 0}
+
+    batch, adjustments = [], []
+    for uid in ids:
+        per_day = max(1, round(entries / len(workdays)))
+        chosen = workdays if entries >= len(workdays) else sorted(rng.sample(workdays, entries))
+        made = 0
+        for day in chosen:
+            if rng.random() < 0.02 and day.weekday() < 5:
+                day += timedelta(days=rng.choice((5, 6)) - day.weekday())  # weekend work instead
+            start = datetime(day.year, day.month, day.day, 6) + timedelta(minutes=rng.randint(0, 180))
+            for _ in range(min(per_day, entries - made)):
+                length = timedelta(minutes=rng.randint(30, 300))
+                if rng.random() < 0.01:
+                    length += timedelta(hours=10)  # night shift across midnight
+                end = start + length
+                if end >= now:
+                    break
+                batch.append({'user_id': uid, 'start_time': start, 'end_time': end,
+                              'duration_minutes': int(length.total_seconds() // 60)})
+                made += 1
+                start = end + timedelta(minutes=rng.randint(10, 60))
+            if rng.random() < 0.01:
+                adjustments.append({'user_id': uid, 'date': day, 'total_minutes': rng.randint(60, 480),
+                                    'edited_by': ids[0], 'updated_at': now})
+            if len(batch) >= INSERT_CHUNK:
+                db.session.execute(db.insert(TimeEntry), batch)
+                counts['entries'] += len(batch)
+                batch = []
+        if rng.random() < running_share:
+            batch.append({'user_id': uid, 'start_time': now - timedelta(minutes=rng.randint(1, 240)), 'end_time': None})
+    if batch:
+        db.session.execute(db.insert(TimeEntry), batch)
+        counts['entries'] += len(batch)
+    if adjustments:
+        unique = {(a['user_id'], a['date']): a for a in adjustments}
+        db.session.execute(db.insert(DailyAdjustment), list(unique.values()))
+        counts['adjustments'] = len(unique)
+    db.session.commit()
+    counts['daily_totals'] = rebuild(ids)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed synthetic time-tracking data')
+    parser.add_argument('--users', type=int, default=200, help='Users to create')
+    parser.add_argument('--entries', type=int, default=1000, help='Time entries per user')
+    parser.add_argument('--years', type=float, default=1.0, help='Years of history to spread them over')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    args = parser.parse_args()
+
+    from traveltogetherapp import create_app
+    from traveltogetherapp.models import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        t0 = time.perf_counter()
+        counts = generate(db, args.users, args.entries, args.years, args.seed)
+        print(', '.join(f'{v} {k}' for k, v in counts.items()) + f' in {time.perf_counter() - t0:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Load test: many virtual RFID readers scanning against a running server.
+
+Usage:
+  python benchmarks/datagen.py --users 500            # seed the server's database first
+  python benchmarks/load_rfid.py --server http://localhost:8080 --readers 40 --rate 2 --duration 30
+  python benchmarks/load_rfid.py --readers 100 --readers-per-listener 10 --duplicate-rate 0.2
+
+Each virtual reader is the listener's own SerialReader (with its Debouncer)
+reading from a fake serial port that emits badge codes with exponential
+inter-arrival times at --rate scans/s. With --duplicate-rate a badge is
+sometimes read twice in a row, as a card held against the reader is.
+Readers are grouped into listeners of --readers-per-listener, each with its
+own ScanSender uploading to /time/scan_batch, like one listen_rfid.py
+process per site. No hardware is needed.
+
+Cards are the ones benchmarks/datagen.py creates (BENCH000000, ...).
+
+Reports achieved scans/s, how many reads were debounced, server results
+(ok / duplicate / error, with the most common errors), scans left in the
+spool (not delivered), and end-to-end latency from the serial read to the
+server's answer.
+"""
+import argparse
+import logging
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import listen_rfid
+from listen_rfid import ScanSender, ScanSpool, SerialReader
+from datagen import card
+
+
+class FakeSerial:
+    """Stands in for serial.Serial: readline() returns badge codes at a given rate."""
+
+    def __init__(self, cards, rate, duplicate_rate, rng, stop_event, stats, timeout=1.0):
+        self.cards = cards
+        self.rate = rate
+        self.duplicate_rate = duplicate_rate
+        self.rng = rng
+        self.stop_event = stop_event
+        self.stats = stats
+        self.timeout = timeout
+        self._next = time.monotonic() + rng.expovariate(rate)
+        self._repeat = None
+
+    def readline(self):
+        if self._repeat is not None:
+            line, self._repeat = self._repeat, None
+            self.stats.count('reads')
+            return line
+        wait = self._next - time.monotonic()
+        if wait > 0:
+            if self.stop_event.wait(min(wait, self.timeout)) or wait > self.timeout:
+                return b''
+        self._next += self.rng.expovariate(self.rate)
+        line = (self.rng.choice(self.cards) + '\n').encode()
+        if self.rng.random() < self.duplicate_rate:
+            self._repeat = line
+        self.stats.count('reads')
+        return line
+
+    def close(self):
+        pass
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = Counter()
+        self.errors = Counter()
+        self.sent_at = {}
+        self.latencies = []
+
+    def count(self, key, n=1):
+        with self._lock:
+            self.counters[key] += n
+
+    def submitted(self, scan_id, at):
+        with self._lock:
+            self.counters['submitted'] += 1
+            self.sent_at[scan_id] = at
+
+    def answered(self, results):
+        now = time.monotonic()
+        with self._lock:
+            for result in results:
+                status = result.get('status', 'error')
+                self.counters[status] += 1
+                if status == 'error':
+                    self.errors[result.get('error', 'unknown')] += 1
+                sent = self.sent_at.pop(result.get('id'), None)
+                if sent is not None:
+                    self.latencies.append((now - sent) * 1000)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+def run(args):
+    stats = Stats()
+    stop = threading.Event()
+    spool_dir = tempfile.mkdtemp(prefix='load-rfid-')
+    cards = [card(i) for i in range(args.cards)]
+    rng = random.Random(args.seed)
+
+    senders, readers = [], []
+    for n in range(0, args.readers, args.readers_per_listener):
+        sender = ScanSender(args.server, ScanSpool(os.path.join(spool_dir, f'listener{n}.jsonl')),
+                            batch_size=args.batch_size, flush_interval=args.flush_interval,
+                            on_results=stats.answered, token=args.token)
+        senders.append(sender)
+
+        def on_scan(rfid, sender=sender):
+            stats.submitted(sender.submit(rfid), time.monotonic())
+
+        for r in range(n, min(n + args.readers_per_listener, args.readers)):
+            port_rng = random.Random(rng.random())
+            fake = FakeSerial(cards, args.rate, args.duplicate_rate, port_rng, stop, stats)
+            readers.append(SerialReader(f'fake{r}', 9600, on_scan, open_serial=lambda p, b, fake=fake: fake))
+
+    for sender in senders:
+        sender.start()
+    started = time.monotonic()
+    for reader in readers:
+        reader.start()
+    try:
+        time.sleep(args.duration)
+    except KeyboardInterrupt:
+        pass
+    stop.set()
+    for reader in readers:
+        reader.stop()
+    for reader in readers:
+        reader.join(timeout=2)
+    scanning = time.monotonic() - started
+    for sender in senders:
+        sender.stop()
+    for sender in senders:
+        sender.join(timeout=args.drain_timeout)
+    elapsed = time.monotonic() - started
+
+    spooled = sum(len(s.spool.load()) for s in senders)
+    shutil.rmtree(spool_dir, ignore_errors=True)
+    return stats, scanning, elapsed, spooled
+
+
+def report(args, stats, scanning, elapsed, spooled):
+    c = stats.counters
+    submitted = c['submitted']
+    answered = c['ok'] + c['duplicate'] + c['error']
+    lat = sorted(stats.latencies)
+
+    def share(n):
+        return f'{n} ({n / submitted:.1%})' if submitted else str(n)
+
+    print(f'{args.readers} readers x {args.rate:g} scans/s for {scanning:.1f}s '
+          f'({len(range(0, args.readers, args.readers_per_listener))} listeners) -> {args.server}')
+    print(f'  serial reads:       {c["reads"]}')
+    print(f'  debounced:          {c["reads"] - submitted}')
+    print(f'  submitted:          {submitted} ({submitted / scanning:.1f}/s)')
+    print(f'  answered:           {answered} ({answered / elapsed:.1f}/s incl. drain)')
+    print(f'  ok:                 {share(c["ok"])}')
+    print(f'  duplicate:          {share(c["duplicate"])}')
+    print(f'  error:              {share(c["error"])}')
+    for message, n in stats.errors.most_common(5):
+        print(f'      {n:>6}  {message}')
+    print(f'  spooled/undelivered:{spooled:>6}')
+    if lat:
+        print(f'  latency ms:         p50 {percentile(lat, 50):.0f}  p95 {percentile(lat, 95):.0f}  '
+              f'p99 {percentile(lat, 99):.0f}  max {lat[-1]:.0f}  mean {statistics.mean(lat):.0f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate many RFID readers against a running server')
+    parser.add_argument('--server', default='http://localhost:5000', help='Server base URL')
+    parser.add_argument('--readers', type=int, default=20, help='Virtual readers (doors)')
+    parser.add_argument('--readers-per-listener', type=int, default=1,
+                        help='Readers sharing one uploader, like ports of one listen_rfid.py')
+    parser.add_argument('--rate', type=float, default=1.0, help='Scans per second per reader')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of scanning')
+    parser.add_argument('--cards', type=int, default=200, help='Distinct cards (BENCH000000...)')
+    parser.add_argument('--duplicate-rate', type=float, default=0.1, help='Share of badges read twice in a row')
+    parser.add_argument('--batch-size', type=int, default=50, help='Max scans per upload')
+    parser.add_argument('--flush-interval', type=float, default=0.5, help='Seconds to collect scans per upload')
+    parser.add_argument('--drain-timeout', type=float, default=10, help='Seconds to wait for uploads at the end')
+    parser.add_argument('--token', default=os.environ.get('RFID_DEVICE_TOKEN'),
+                        help='Device token, if the server sets DEVICE_TOKEN_REQUIRED')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # The listener logs every scan and rejection; those are counted in the report
+    listen_rfid.logger.setLevel(logging.ERROR)
+    report(args, *run(args))
+
+
+if __name__ == '__main__':
+    main()
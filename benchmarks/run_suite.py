@@ -0,0 +1,293 @@
+"""
+Benchmark suite for the time-tracking workload, with saved baselines.
+
+Usage:
+  python benchmarks/run_suite.py                                  # run, compare with the baseline if any
+  python benchmarks/run_suite.py --users 500 --entries 2000 --years 3
+  python benchmarks/run_suite.py --save-baseline                  # record the current numbers
+  python benchmarks/run_suite.py --only scan_burst timelogs --json out.json
+
+Seeds a throwaway SQLite database with benchmarks/datagen.py (or uses
+DATABASE_URL, e.g. an empty Postgres database) and replays, in-process
+through the Flask test client:
+  scan_burst      POST /time/toggle_by_rfid from --burst concurrent readers
+  rfid_start_stop POST /time/start_by_rfid then /time/stop_by_rfid
+  timelogs        GET /timelogs as an editor
+  timelogs_user   GET /timelogs/<id>
+  profile         GET /profile/<id> as the owner
+  weekly_report   aggregate_weekly.write_week() for a recent week
+
+For each workload it reports throughput, p50/p95/p99 latency and SQL
+queries per operation. Results are compared with the baseline file
+(benchmarks/baselines/<name>.json); the run exits with status 1 if p95
+latency grows by more than --tolerance or queries per operation increase.
+Baselines are machine-specific: record them on the machine that compares.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+WORKLOADS = ('scan_burst', 'rfid_start_stop', 'timelogs', 'timelogs_user', 'profile', 'weekly_report')
+
+
+class QueryCounter:
+    """Counts SQL statements per thread via SQLAlchemy engine events."""
+
+    def __init__(self, engine):
+        self._local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args, **kwargs):
+        self._local.n = getattr(self._local, 'n', 0) + 1
+
+    def reset(self):
+        self._local.n = 0
+
+    @property
+    def value(self):
+        return getattr(self._local, 'n', 0)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(latencies, queries, wall):
+    latencies = sorted(latencies)
+    return {
+        'ops': len(latencies),
+        'throughput': len(latencies) / wall if wall else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'queries_per_op': statistics.mean(queries) if queries else 0.0,
+    }
+
+
+def client_for(app, user_id):
+    from traveltogetherapp.models import db, User
+
+    with app.app_context():
+        login_id = db.session.get(User, user_id).get_id()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = login_id
+        session['_fresh'] = True
+    return client
+
+
+def measure(counter, fn, iterations):
+    latencies, queries = [], []
+    t_start = time.perf_counter()
+    for i in range(iterations):
+        counter.reset()
+        t0 = time.perf_counter()
+        fn(i)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        queries.append(counter.value)
+    return summarize(latencies, queries, time.perf_counter() - t_start)
+
+
+def check(resp, expected=(200,)):
+    if resp.status_code not in expected:
+        raise RuntimeError(f'{resp.request.method} {resp.request.path} -> {resp.status_code}')
+
+
+def run_workloads(app, db, args, counter):
+    from datagen import card
+    from traveltogetherapp.models import User
+    from aggregate_weekly import write_week
+
+    rng = random.Random(args.seed)
+    with app.app_context():
+        users = db.session.execute(db.select(User.id, User.role).where(User.rfid.like('BENCH%')).order_by(User.id)).all()
+    editor_id = next(u.id for u in users if u.role == 'editor')
+    user_ids = [u.id for u in users]
+    editor = client_for(app, editor_id)
+    results = {}
+
+    def scan_burst():
+        per_thread = max(1, args.iterations // args.burst)
+        latencies, queries = [], []
+        lock = threading.Lock()
+
+        def reader(n):
+            local_rng = random.Random(args.seed + n)
+            client = app.test_client()
+            mine_l, mine_q = [], []
+            for _ in range(per_thread):
+                counter.reset()
+                t0 = time.perf_counter()
+                resp = client.post('/time/toggle_by_rfid', json={'rfid': card(local_rng.randrange(len(users)))})
+                check(resp, (200, 409))  # 409: two readers raced on the same card
+                mine_l.append((time.perf_counter() - t0) * 1000)
+                mine_q.append(counter.value)
+            with lock:
+                latencies.extend(mine_l)
+                queries.extend(mine_q)
+
+        threads = [threading.Thread(target=reader, args=(n,)) for n in range(args.burst)]
+        t_start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return summarize(latencies, queries, time.perf_counter() - t_start)
+
+    def rfid_start_stop():
+        client = app.test_client()
+
+        def op(i):
+            rfid = card(rng.randrange(len(users)))
+            client.post('/time/stop_by_rfid', json={'rfid': rfid})
+            check(client.post('/time/start_by_rfid', json={'rfid': rfid}))
+        return measure(counter, op, args.iterations)
+
+    def timelogs():
+        return measure(counter, lambda i: check(editor.get('/timelogs')), args.iterations)
+
+    def timelogs_user():
+        return measure(counter, lambda i: check(editor.get(f'/timelogs/{rng.choice(user_ids)}')), args.iterations)
+
+    def profile():
+        clients = {}
+
+        def op(i):
+            uid = rng.choice(user_ids)
+            client = clients.get(uid) or clients.setdefault(uid, client_for(app, uid))
+            check(client.get(f'/profile/{uid}'))
+        return measure(counter, op, args.iterations)
+
+    def weekly_report():
+        out = tempfile.mkdtemp(prefix='bench-weekly-')
+        today = datetime.utcnow().date()
+        mondays = [today - timedelta(days=today.weekday() + 7 * n) for n in range(1, 9)]
+        try:
+            with app.app_context():
+                return measure(counter, lambda i: write_week(mondays[i % len(mondays)], out),
+                               max(1, args.iterations // 20))
+        finally:
+            shutil.rmtree(out, ignore_errors=True)
+
+    runners = {'scan_burst': scan_burst, 'rfid_start_stop': rfid_start_stop, 'timelogs': timelogs,
+               'timelogs_user': timelogs_user, 'profile': profile, 'weekly_report': weekly_report}
+    for name in args.only or WORKLOADS:
+        results[name] = runners[name]()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages (empty if none)."""
+    failures = []
+    for name, cur in results.items():
+        base = baseline.get('workloads', {}).get(name)
+        if not base:
+            continue
+        if cur['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            failures.append(f"{name}: p95 {cur['p95_ms']:.2f} ms > baseline {base['p95_ms']:.2f} ms (+{tolerance:.0%})")
+        if cur['queries_per_op'] > base['queries_per_op'] + 0.5:
+            failures.append(f"{name}: {cur['queries_per_op']:.1f} queries/op > baseline {base['queries_per_op']:.1f}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time-tracking benchmark suite')
+    parser.add_argument('--users', type=int, default=200, help='Users to seed')
+    parser.add_argument('--entries', type=int, default=500, help='Time entries per user')
+    parser.add_argument('--years', type=float, default=1.0, help='Years of history')
+    parser.add_argument('--iterations', type=int, default=200, help='Operations per workload')
+    parser.add_argument('--burst', type=int, default=8, help='Concurrent readers in scan_burst')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', nargs='+', choices=WORKLOADS, help='Run only these workloads')
+    parser.add_argument('--name', default='default', help='Baseline name (benchmarks/baselines/<name>.json)')
+    parser.add_argument('--baseline', help='Baseline file to compare with (default: by --name)')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p95 growth (default: 0.25 = 25%%)')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    tmp_dir = None
+    if not os.environ.get('DATABASE_URL'):
+        tmp_dir = tempfile.TemporaryDirectory(prefix='bench-suite-')
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp_dir.name, 'bench.db')}"
+
+    from traveltogetherapp import create_app
+    from traveltogetherapp.models import db
+    from datagen import generate
+
+    app = create_app()
+    try:
+        with app.app_context():
+            db.create_all()
+            t0 = time.perf_counter()
+            counts = generate(db, args.users, args.entries, args.years, args.seed)
+            print(f"Seeded {counts['users']} users / {counts['entries']} entries in {time.perf_counter() - t0:.1f}s")
+            counter = QueryCounter(db.engine)
+        results = run_workloads(app, db, args, counter)
+    finally:
+        if tmp_dir:
+            tmp_dir.cleanup()
+
+    print(f"\n{'workload':<17}{'ops':>6}{'ops/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}")
+    for name, r in results.items():
+        print(f"{name:<17}{r['ops']:>6}{r['throughput']:>10.1f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+              f"{r['p99_ms']:>9.2f}{r['queries_per_op']:>9.1f}")
+
+    report = {
+        'created': datetime.utcnow().isoformat() + 'Z',
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'params': {k: getattr(args, k) for k in ('users', 'entries', 'years', 'iterations', 'burst', 'seed')},
+        'database': make_url(os.environ['DATABASE_URL']).get_backend_name(),
+        'workloads': results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f'{args.name}.json')
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nBaseline saved to {baseline_path}')
+        return
+    if not os.path.exists(baseline_path):
+        print(f'\nNo baseline at {baseline_path}; run with --save-baseline to record one.')
+        return
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('params') != report['params']:
+        print('\nWarning: baseline was recorded with different parameters:', baseline.get('params'))
+    failures = compare(results, baseline, args.tolerance)
+    if failures:
+        print('\nRegressions against', baseline_path)
+        for line in failures:
+            print('  ' + line)
+        sys.exit(1)
+    print(f'\nNo regressions against {baseline_path}')
+
+
+if __name__ == '__main__':
+    main()
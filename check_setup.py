@@ -97,7 +97,7 @@ def main():
     
     print("\n4. Checking database tables...")
     if not check_tables_exist():
-        print("\n⚠️  Some tables are missing. Run: python init_db.py")
+        print("\n⚠️  Some tables are missing. Run: python upgrade_db.py")
         return
     
     print("\n" + "=" * 70)
@@ -1,8 +1,71 @@
 import os
+from datetime import timedelta
 
 class Config:
     SECRET_KEY = "sett-en-sterk-nokkel-her"
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL") or "sqlite:///MiniGuardian.db"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-
-
+    # Number of complete weeks shown per page on /timelogs/<user_id>
+    TIMELOGS_WEEKS_PER_PAGE = int(os.environ.get("TIMELOGS_WEEKS_PER_PAGE", 8))
+    # Time entries per page on the profile page (older ones load on demand)
+    PROFILE_ENTRIES_PER_PAGE = int(os.environ.get("PROFILE_ENTRIES_PER_PAGE", 20))
+    # Max RFID cards kept in the in-process scan cache (0 disables it)
+    RFID_CACHE_SIZE = int(os.environ.get("RFID_CACHE_SIZE", 1024))
+    # Seconds a cached card/timer state is trusted; bounds staleness across workers (0 disables the cache)
+    RFID_CACHE_TTL = float(os.environ.get("RFID_CACHE_TTL", 30))
+    # Days scan ids from /time/scan_batch are kept for duplicate detection (longer than a listener spools)
+    SCAN_ID_RETENTION_DAYS = int(os.environ.get("SCAN_ID_RETENTION_DAYS", 30))
+    # Editor whitelist; re-read when its mtime changes (checked every N seconds)
+    WHITELIST_PATH = os.environ.get("WHITELIST_PATH")
+    WHITELIST_CHECK_INTERVAL = float(os.environ.get("WHITELIST_CHECK_INTERVAL", 5))
+    # Live timer stream (/time/stream): heartbeat, snapshot resync and max connection age in seconds
+    SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", 15))
+    SSE_RESYNC_SECONDS = float(os.environ.get("SSE_RESYNC_SECONDS", 30))
+    SSE_MAX_SECONDS = float(os.environ.get("SSE_MAX_SECONDS", 300))
+    # Open streams per process (each holds a gunicorn thread); keep well below GUNICORN_THREADS.
+    # Clients over the cap poll the snapshot every SSE_RESYNC_SECONDS instead.
+    SSE_MAX_STREAMS = int(os.environ.get("SSE_MAX_STREAMS", 3))
+    # SQLite pragmas set on every new connection (empty value = leave the SQLite default)
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", -64 * 1024))  # negative = KiB
+    # Connection pool for server databases (Postgres/MariaDB); per worker process
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 10))
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") != "0"
+    # Logged-in user record cached per process for N seconds (0 disables it)
+    USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 30))
+    USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 1024))
+    # Request instrumentation and Prometheus /metrics (off unless METRICS_ENABLED=1)
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "0") == "1"
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")  # /metrics requires "Authorization: Bearer <token>" (no token: debug only)
+    # Requests to these endpoints are stack-sampled; slower than SLOW_REQUEST_MS -> profile in PROFILE_DIR
+    PROFILE_ENDPOINTS = [e for e in os.environ.get("PROFILE_ENDPOINTS", "auth.timelogs,auth.timelogs_user").split(",") if e]
+    SLOW_REQUEST_MS = int(os.environ.get("SLOW_REQUEST_MS", 500))
+    PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+    PROFILE_DIR = os.environ.get("PROFILE_DIR")
+    # Password hashing: Werkzeug method string (cost), run in a bounded pool off the request threads.
+    # Changing the method upgrades each user's hash on their next login.
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_SALT_LENGTH = int(os.environ.get("PASSWORD_SALT_LENGTH", 16))
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_POOL = os.environ.get("PASSWORD_HASH_POOL", "thread")  # "thread" or "process"
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 32))
+    # Login sessions: "Remember me" cookie lifetime, and sessions opened by a kiosk device token (/device/login)
+    REMEMBER_COOKIE_DURATION = timedelta(days=int(os.environ.get("REMEMBER_COOKIE_DAYS", 30)))
+    REMEMBER_COOKIE_SAMESITE = "Lax"
+    REMEMBER_COOKIE_HTTPONLY = True
+    # HTTPS-only login cookies (browsers also accept them on http://localhost); COOKIE_SECURE=0 for plain-HTTP hosts
+    REMEMBER_COOKIE_SECURE = os.environ.get("COOKIE_SECURE", "1") != "0"
+    SESSION_COOKIE_SECURE = REMEMBER_COOKIE_SECURE
+    PERMANENT_SESSION_LIFETIME = timedelta(days=int(os.environ.get("DEVICE_SESSION_DAYS", 90)))
+    # Device tokens (kiosks / RFID listeners): seconds a verified token is trusted before re-checking revocation.
+    # DEVICE_TOKEN_REQUIRED=1 rejects RFID scan requests that carry no token. Off by default so existing
+    # listeners keep working: the RFID endpoints are then open to anyone who can reach the server
+    # (fly.toml turns it on for production).
+    DEVICE_TOKEN_CACHE_TTL = float(os.environ.get("DEVICE_TOKEN_CACHE_TTL", 60))
+    DEVICE_TOKEN_REQUIRED = os.environ.get("DEVICE_TOKEN_REQUIRED", "0") == "1"
@@ -0,0 +1,58 @@
+"""
+Issue, list and revoke device tokens for kiosks and RFID listeners.
+
+Usage:
+  python device_tokens.py create "Door A reader"                   # scanner token
+  python device_tokens.py create "Lobby kiosk" --user kiosk@example.com
+  python device_tokens.py list
+  python device_tokens.py revoke 3
+
+Creates the device_token table if it does not exist yet. The token is
+printed once; only its hash is stored. Give a scanner token to
+listen_rfid.py (--token or RFID_DEVICE_TOKEN); a kiosk signs in with its
+token at /device/login. Revoked tokens stop working in every worker within
+DEVICE_TOKEN_CACHE_TTL seconds.
+"""
+import argparse
+import sys
+
+from traveltogetherapp import create_app
+from traveltogetherapp.models import db, User, DeviceToken
+from traveltogetherapp.device_tokens import device_tokens
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage device tokens')
+    sub = parser.add_subparsers(dest='command', required=True)
+    create = sub.add_parser('create', help='Issue a new token')
+    create.add_argument('name', help='Device name, e.g. "Door A reader"')
+    create.add_argument('--user', help='Email of the user a kiosk signs in as')
+    sub.add_parser('list', help='List tokens')
+    revoke = sub.add_parser('revoke', help='Revoke a token')
+    revoke.add_argument('id', type=int, help='Token id (see list)')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        DeviceToken.__table__.create(db.engine, checkfirst=True)
+        if args.command == 'create':
+            user_id = None
+            if args.user:
+                user_id = db.session.execute(db.select(User.id).where(User.email == args.user)).scalar_one_or_none()
+                if user_id is None:
+                    sys.exit(f'No user with email {args.user}')
+            row, token = device_tokens.issue(args.name, user_id)
+            print(f'Device token {row.id} for {row.name} (shown only once):')
+            print(token)
+        elif args.command == 'list':
+            rows = db.session.execute(
+                db.select(DeviceToken, User.email).outerjoin(User, User.id == DeviceToken.user_id).order_by(DeviceToken.id)
+            ).all()
+            for token, email in rows:
+                state = f'revoked {token.revoked_at:%Y-%m-%d %H:%M}' if token.revoked_at else 'active'
+                last = f'{token.last_used_at:%Y-%m-%d %H:%M}' if token.last_used_at else 'never'
+                print(f'{token.id:>4}  {token.name:<30} {email or "-":<30} last used {last:<16}  {state}')
+        else:
+            if device_tokens.revoke(args.id):
+                print(f'Revoked device token {args.id}.')
+            else:
+                sys.exit(f'No active device token with id {args.id}')
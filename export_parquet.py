@@ -0,0 +1,210 @@
+"""
+Export time data as Parquet files partitioned by ISO week, for analytics.
+
+Usage:
+  python export_parquet.py                        # new, recent and changed weeks
+  python export_parquet.py --from 2026-01-01      # limit to a date range
+  python export_parquet.py --refresh-weeks 8      # always rewrite the last 8 weeks
+  python export_parquet.py --overwrite            # rewrite every week
+
+Writes typed columnar files (timestamps as timestamp[us, UTC], dates as
+date32) instead of CSV strings:
+
+  <out>/time_entry/week=2026-W41/part-0.parquet
+  <out>/daily_adjustment/week=2026-W41/part-0.parquet
+  <out>/daily_total/week=2026-W41/part-0.parquet
+
+Week numbers are zero-padded (2026-W05) so partitions sort by name.
+
+A later run writes weeks that have no partition yet, and rewrites a week
+that was exported before if it is one of the last --refresh-weeks complete
+weeks, or if its data changed since the partition was written:
+  - a daily adjustment was added or edited after that (updated_at),
+  - the export contains an entry that was still running,
+  - the number of time entries differs.
+The ongoing week is skipped until it is complete (use --include-current to
+export it anyway).
+
+Read back with e.g. pandas.read_parquet('<out>/time_entry').
+
+Requires pyarrow (pip install -r requirements-export.txt); it is not needed
+by the web app.
+"""
+import argparse
+import os
+import shutil
+import sys
+from datetime import date, datetime, timedelta, timezone
+
+from traveltogetherapp import create_app
+from traveltogetherapp.models import db, TimeEntry, DailyAdjustment, DailyTotal
+from traveltogetherapp.aggregation import day_start
+from aggregate_weekly import week_label, weeks_between
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency, only for this script
+    pa = pq = None
+
+DEFAULT_OUT = os.path.join(os.path.dirname(__file__), 'data', 'parquet')
+TABLES = ('time_entry', 'daily_adjustment', 'daily_total')
+# Recent weeks are rewritten on every run; late scans and edits mostly land there
+REFRESH_WEEKS = 4
+
+
+def partition_label(monday):
+    """ISO week as '2026-W05' (zero-padded, unlike the CSV report names)."""
+    year, week, _ = monday.isocalendar()
+    return f'{year}-W{week:02d}'
+
+
+def _part_file(out_dir, table, monday):
+    return os.path.join(out_dir, table, f'week={partition_label(monday)}', 'part-0.parquet')
+
+
+def _schemas():
+    ts = pa.timestamp('us', tz='UTC')
+    return {
+        'time_entry': pa.schema([
+            ('id', pa.int64()), ('user_id', pa.int64()),
+            ('start_time', ts), ('end_time', ts), ('duration_seconds', pa.int64()),
+        ]),
+        'daily_adjustment': pa.schema([
+            ('user_id', pa.int64()), ('date', pa.date32()), ('total_minutes', pa.int32()),
+            ('edited_by', pa.int64()), ('updated_at', ts),
+        ]),
+        'daily_total': pa.schema([
+            ('user_id', pa.int64()), ('date', pa.date32()), ('seconds', pa.int64()),
+        ]),
+    }
+
+
+def _week_columns(table, monday):
+    """Read one week of a table as a dict of columns."""
+    sunday = monday + timedelta(days=6)
+    if table == 'time_entry':
+        rows = db.session.execute(
+            db.select(TimeEntry.id, TimeEntry.user_id, TimeEntry.start_time, TimeEntry.end_time)
+            .where(TimeEntry.start_time >= day_start(monday), TimeEntry.start_time < day_start(sunday) + timedelta(days=1))
+            .order_by(TimeEntry.user_id, TimeEntry.start_time)
+        ).all()
+        return {
+            'id': [r.id for r in rows],
+            'user_id': [r.user_id for r in rows],
+            'start_time': [r.start_time for r in rows],
+            'end_time': [r.end_time for r in rows],
+            'duration_seconds': [int((r.end_time - r.start_time).total_seconds()) if r.end_time else None for r in rows],
+        }
+    if table == 'daily_adjustment':
+        rows = db.session.execute(
+            db.select(DailyAdjustment.user_id, DailyAdjustment.date, DailyAdjustment.total_minutes,
+                      DailyAdjustment.edited_by, DailyAdjustment.updated_at)
+            .where(DailyAdjustment.date >= monday, DailyAdjustment.date <= sunday)
+            .order_by(DailyAdjustment.user_id, DailyAdjustment.date)
+        ).all()
+        return {name: [getattr(r, name) for r in rows]
+                for name in ('user_id', 'date', 'total_minutes', 'edited_by', 'updated_at')}
+    rows = db.session.execute(
+        db.select(DailyTotal.user_id, DailyTotal.date, DailyTotal.seconds)
+        .where(DailyTotal.date >= monday, DailyTotal.date <= sunday)
+        .order_by(DailyTotal.user_id, DailyTotal.date)
+    ).all()
+    return {name: [getattr(r, name) for r in rows] for name in ('user_id', 'date', 'seconds')}
+
+
+def week_changed(monday, out_dir):
+    """True if the week has no export yet, or its data changed since it was written."""
+    files = [_part_file(out_dir, table, monday) for table in TABLES]
+    existing = [f for f in files if os.path.exists(f)]
+    if not existing:
+        return True
+    exported = datetime.fromtimestamp(min(os.path.getmtime(f) for f in existing), timezone.utc).replace(tzinfo=None)
+    sunday = monday + timedelta(days=6)
+
+    adjusted = db.session.execute(
+        db.select(DailyAdjustment.id).where(
+            DailyAdjustment.date >= monday, DailyAdjustment.date <= sunday, DailyAdjustment.updated_at > exported
+        ).limit(1)
+    ).first()
+    if adjusted:
+        return True
+
+    entries = db.session.execute(
+        db.select(db.func.count(TimeEntry.id))
+        .where(TimeEntry.start_time >= day_start(monday), TimeEntry.start_time < day_start(sunday) + timedelta(days=1))
+    ).scalar()
+    if not os.path.exists(files[0]):
+        return entries > 0
+    if pq.read_metadata(files[0]).num_rows != entries:
+        return True
+    # Entries that were still running when exported have no end_time there
+    return pq.read_table(files[0], columns=['end_time']).column('end_time').null_count > 0
+
+
+def export_week(monday, out_dir):
+    """Write (or rewrite) the partitions for one week. Returns the number of files written."""
+    written = 0
+    for table, schema in _schemas().items():
+        part_file = _part_file(out_dir, table, monday)
+        # Partitions written before week numbers were zero-padded would duplicate this week
+        legacy_dir = os.path.join(out_dir, table, f'week={week_label(monday)}')
+        if legacy_dir != os.path.dirname(part_file):
+            shutil.rmtree(legacy_dir, ignore_errors=True)
+        columns = _week_columns(table, monday)
+        if not columns[schema.names[0]]:
+            # Nothing left for this week (e.g. an adjustment was removed)
+            if os.path.exists(part_file):
+                os.remove(part_file)
+            continue
+        os.makedirs(os.path.dirname(part_file), exist_ok=True)
+        tmp = part_file + '.tmp'
+        pq.write_table(pa.Table.from_pydict(columns, schema=schema), tmp, compression='zstd')
+        os.replace(tmp, part_file)
+        written += 1
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export time data as week-partitioned Parquet')
+    parser.add_argument('--out', default=DEFAULT_OUT, help='Output directory (default: data/parquet)')
+    parser.add_argument('--from', dest='date_from', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                        help='First day to export (default: first recorded entry)')
+    parser.add_argument('--to', dest='date_to', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                        help='Last day to export (default: end of last complete week)')
+    parser.add_argument('--overwrite', action='store_true', help='Rewrite every week, changed or not')
+    parser.add_argument('--refresh-weeks', type=int, default=REFRESH_WEEKS,
+                        help=f'Always rewrite this many of the latest weeks (default: {REFRESH_WEEKS})')
+    parser.add_argument('--include-current', action='store_true', help='Also export the ongoing week')
+    args = parser.parse_args(argv)
+
+    if pa is None:
+        print('pyarrow is required for Parquet export: pip install pyarrow', file=sys.stderr)
+        sys.exit(1)
+
+    app = create_app()
+    with app.app_context():
+        today = datetime.utcnow().date()
+        current_monday = today - timedelta(days=today.weekday())
+        date_from = args.date_from
+        if date_from is None:
+            first = db.session.execute(db.select(db.func.min(TimeEntry.start_time))).scalar()
+            if first is None:
+                print('No time entries to export.')
+                return
+            date_from = first.date()
+        date_to = args.date_to or today
+        weeks = [m for m in weeks_between(date_from, date_to)
+                 if args.include_current or m < current_monday]
+
+        refresh_from = current_monday - timedelta(weeks=args.refresh_weeks)
+        files = exported = 0
+        for monday in weeks:
+            if args.overwrite or monday >= refresh_from or week_changed(monday, args.out):
+                files += export_week(monday, args.out)
+                exported += 1
+        print(f'Wrote {files} Parquet file(s) for {exported} of {len(weeks)} week(s) to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Production server settings for gunicorn (picked up automatically from the
+working directory).
+
+Usage:
+  gunicorn                                  # uses this file, serves app:app
+  WEB_CONCURRENCY=4 GUNICORN_THREADS=16 gunicorn
+  kill -HUP <master pid>                    # graceful reload of the workers
+
+gthread workers are used: each worker process runs a pool of threads, so a
+long-lived /time/stream (SSE) connection occupies one thread and not a whole
+process. It still holds that thread for up to SSE_MAX_SECONDS, so open streams
+are capped at SSE_MAX_STREAMS per process (default 3 of the 8 threads; extra
+clients poll instead). Raise GUNICORN_THREADS before raising that cap, or
+every thread can end up serving a stream while scans wait. The app is imported once in the master (preload) and forked, which
+saves memory and start-up time per worker; each worker then opens its own
+database connections and warms them up before accepting requests.
+
+On start-up the master creates missing tables, columns and indexes and
+backfills the DailyTotal rollup (schema.upgrade(), idempotent), so a deploy
+needs no manual migration step; DB_UPGRADE_ON_START=0 turns that off.
+
+Every setting can be overridden from the environment, see below.
+"""
+import multiprocessing
+import os
+
+wsgi_app = "app:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+
+# Default: 2 x cores + 1 processes, capped so small VMs don't run out of memory
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 4)))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+
+# Keep idle connections from the proxy open between requests
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+# gthread's timeout is a worker heartbeat, so it does not cut off SSE streams
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+# Recycle workers now and then to bound memory growth (jitter avoids all at once)
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+# Set GUNICORN_PRELOAD=0 for HUP to reload changed code too (workers import the app themselves)
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-")
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOGLEVEL", "info")
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "*")
+# Pooled DB connections each worker opens before taking traffic (0 disables warm-up)
+warm_connections = int(os.environ.get("WARM_DB_CONNECTIONS", 1))
+# Create missing tables/columns/indexes and backfill the rollup once in the master before workers start
+upgrade_db_on_start = os.environ.get("DB_UPGRADE_ON_START", "1") != "0"
+
+
+def on_starting(server):
+    """Bring the database schema up to date (same as python upgrade_db.py)."""
+    if not upgrade_db_on_start:
+        return
+    from app import app
+    from traveltogetherapp.models import db
+    from traveltogetherapp.schema import upgrade
+    with app.app_context():
+        try:
+            upgrade()
+        except Exception as e:
+            server.log.error(f"Database upgrade failed: {e}")
+        finally:
+            db.session.remove()
+            db.engine.dispose()
+
+
+def when_ready(server):
+    """Compile the templates once in the master so forked workers share them."""
+    if not preload_app:
+        return
+    from app import app
+    from traveltogetherapp.warmup import warm_templates
+    warm_templates(app)
+
+
+def post_fork(server, worker):
+    """Drop database connections inherited from the master after a preload."""
+    if not preload_app:
+        return
+    from app import app
+    from traveltogetherapp.models import db
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    """Warm up before the worker accepts its first request (e.g. a badge scan after idle)."""
+    from app import app
+    from traveltogetherapp.warmup import warm_up
+    warm_up(app, templates=not preload_app, connections=warm_connections)
@@ -0,0 +1,36 @@
+"""
+Bulk-import editor emails into whitelist.txt, e.g. from an HR export.
+
+Usage:
+  python import_whitelist.py hr_export.csv             # add to the whitelist
+  python import_whitelist.py hr_export.csv --replace   # replace the whitelist
+
+Accepts plain one-email-per-line files or CSV (the first field that looks
+like an email address is used). Run it in the source tree and commit and
+redeploy whitelist.txt: it ships inside the image, and a file changed in a
+running container is lost on the next deploy. A local app picks the change
+up on its next mtime check, or immediately via "Reload" on /admin.
+"""
+import argparse
+import sys
+
+from traveltogetherapp import create_app
+from traveltogetherapp.whitelist import role_policy
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bulk-import editor emails into the whitelist')
+    parser.add_argument('file', help='Text or CSV file with email addresses')
+    parser.add_argument('--replace', action='store_true', help='Replace the whitelist instead of adding')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        before = len(role_policy)
+        try:
+            with open(args.file, 'r', encoding='utf-8', errors='ignore') as f:
+                result = role_policy.bulk_import(f, replace=args.replace)
+        except ValueError as e:
+            sys.exit(str(e))
+        for line in result.rejected:
+            print(f'Skipped (no email address): {line}', file=sys.stderr)
+        print(f'Whitelist now has {result.count} editor emails (was {before}).')
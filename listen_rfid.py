@@ -3,19 +3,33 @@ Background script to listen for RFID scans from Arduino and trigger time logging
 
 Usage:
   python listen_rfid.py --port COM3 --server http://localhost:5000
+  python listen_rfid.py --port /dev/ttyUSB0 /dev/ttyUSB1   # several door readers
+  python listen_rfid.py --port COM3 --token <device token>  # or set RFID_DEVICE_TOKEN
 
 The script reads from an Arduino serial port and sends RFID codes to the Flask app
 to start/stop timers for users.
 
+Each serial port is read by its own thread (blocking reads, no polling).
+Scans are timestamped when read and queued; a sender thread uploads them in
+batches to /time/scan_batch over a pooled HTTP session. Scans that cannot be
+delivered (server slow, down or cold-starting) are appended to a local spool
+file and replayed, in order, once the server answers again.
+
 Arduino should send RFID data as: "<RFID_CODE>\n"
 """
 
 import serial
 import argparse
+import json
+import os
+import queue
 import requests
+import threading
 import time
-import sys
 import logging
+import uuid
+from datetime import datetime, timezone
+from requests.adapters import HTTPAdapter
 
 logging.basicConfig(
     level=logging.INFO,
@@ -23,90 +37,303 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+DEFAULT_SPOOL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rfid_spool.jsonl')
+DEBOUNCE_SECONDS = 1  # Ignore duplicate scans within 1 second
+
+
+class ScanSpool:
+    """Append-only JSON-lines file holding scans not yet accepted by the server."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, events):
+        if not events:
+            return
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            for ev in events:
+                f.write(json.dumps(ev) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load(self):
+        with self._lock:
+            if not os.path.exists(self.path):
+                return []
+            events = []
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        logger.warning(f"Skipping corrupt spool line: {line[:80]}")
+            return events
+
+    def replace(self, events):
+        """Atomically replace the spool contents (empty list removes the file)."""
+        with self._lock:
+            if not events:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                return
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for ev in events:
+                    f.write(json.dumps(ev) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+
+
+class ScanSender(threading.Thread):
+    """Uploads queued scans in batches and spools them while the server is unreachable."""
+
+    def __init__(self, server, spool, batch_size=50, flush_interval=0.5, retry_interval=5, timeout=5,
+                 on_results=None, token=None):
+        super().__init__(daemon=True, name='scan-sender')
+        self.url = f"{server.rstrip('/')}/time/scan_batch"
+        self.spool = spool
+        # Optional callback(results) for each answered batch (used by benchmarks/load_rfid.py)
+        self.on_results = on_results
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self.queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._last_attempt = 0.0
+        # Persistent keep-alive connection instead of a new TCP/TLS handshake per scan
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if token:
+            # Device token issued by an admin (device_tokens.py create)
+            self.session.headers['Authorization'] = f'Bearer {token}'
+
+    def submit(self, rfid, action='toggle'):
+        """Queue a scan stamped with the time it was read. Returns the scan id."""
+        scan_id = uuid.uuid4().hex
+        self.queue.put({
+            'id': scan_id,
+            'rfid': rfid,
+            'action': action,
+            'ts': datetime.now(timezone.utc).isoformat(),
+        })
+        return scan_id
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            batch = self._collect()
+            if batch or (time.monotonic() - self._last_attempt) >= self.retry_interval:
+                self.flush(batch)
+        # Drain whatever is left; spool it if the server can't take it
+        self.flush(self._collect(block=False))
+
+    def _collect(self, block=True):
+        batch = []
+        try:
+            if block:
+                batch.append(self.queue.get(timeout=self.flush_interval))
+            while len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def flush(self, batch):
+        """Send spooled scans first, then the new batch; spool anything undelivered."""
+        pending = self.spool.load()
+        replaying = len(pending)
+        if not pending and not batch:
+            return
+        pending.extend(batch)
+        self._last_attempt = time.monotonic()
+        sent = 0
+        try:
+            while sent < len(pending):
+                chunk = pending[sent:sent + self.batch_size]
+                resp = self.session.post(self.url, json={'events': chunk}, timeout=self.timeout)
+                if resp.status_code >= 500:
+                    raise requests.exceptions.HTTPError(f"Server error ({resp.status_code})")
+                if resp.status_code == 401:
+                    # Missing or revoked device token: keep the scans until it is fixed
+                    raise requests.exceptions.HTTPError(f"Not authorized ({resp.text[:200]})")
+                if resp.status_code == 409:
+                    # Server database not upgraded yet: keep the scans until it is
+                    raise requests.exceptions.HTTPError(f"Server not ready ({resp.text[:200]})")
+                if resp.status_code != 200:
+                    # Rejected as a whole (bad request): don't retry it forever
+                    logger.warning(f"Batch rejected ({resp.status_code}): {resp.text[:200]}")
+                else:
+                    results = resp.json().get('results', [])
+                    self._log_results(results)
+                    if self.on_results:
+                        self.on_results(results)
+                sent += len(chunk)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Failed to reach server, spooling {len(pending) - sent} scan(s): {e}")
+        if sent == len(pending):
+            if replaying:
+                self.spool.replace([])
+                logger.info(f"Replayed {replaying} spooled scan(s)")
+        elif sent == 0:
+            self.spool.append(batch)
+        else:
+            self.spool.replace(pending[sent:])
+
+    def _log_results(self, results):
+        for result in results:
+            status = result.get('status')
+            if status == 'ok':
+                logger.info(f"✓ Timer {result.get('action')} for {result.get('user')}")
+            elif status == 'duplicate':
+                logger.debug(f"Already applied scan {result.get('id')}")
+            else:
+                logger.warning(f"Scan rejected: {result.get('error', 'Unknown')}")
+
+
+class Debouncer:
+    """Drops repeated reads of the same card within a short window."""
 
-def listen_rfid(port='COM3', baudrate=9600, server='http://localhost:5000', action='toggle'):
+    def __init__(self, window=1.0):
+        self.window = window
+        self.last_rfid = None
+        self.last_time = 0.0
+
+    def accept(self, rfid, now=None):
+        now = time.monotonic() if now is None else now
+        if rfid == self.last_rfid and (now - self.last_time) < self.window:
+            return False
+        self.last_rfid = rfid
+        self.last_time = now
+        return True
+
+
+def parse_scan_line(raw):
+    """Decode one serial line into an RFID code, or None for blanks/comments."""
+    rfid = raw.decode('utf-8', errors='ignore').strip()
+    if not rfid or rfid.startswith('#'):
+        return None
+    return rfid
+
+
+class SerialReader(threading.Thread):
+    """Reads one serial port and hands scans to a callback.
+
+    readline() blocks in the driver until a line arrives or the read timeout
+    expires, so an idle reader uses no CPU and never waits on the network.
+    The port is reopened if the device disappears (e.g. USB replug).
     """
-    Listen for RFID scans from Arduino.
-    
+
+    def __init__(self, port, baudrate, on_scan, open_serial=None, reopen_delay=2.0):
+        super().__init__(daemon=True, name=f'serial-{port}')
+        self.port = port
+        self.baudrate = baudrate
+        self.on_scan = on_scan
+        self.open_serial = open_serial or (lambda p, b: serial.Serial(p, b, timeout=1))
+        self.reopen_delay = reopen_delay
+        self.debouncer = Debouncer(DEBOUNCE_SECONDS)
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                ser = self.open_serial(self.port, self.baudrate)
+            except (serial.SerialException, OSError) as e:
+                logger.error(f"Failed to open {self.port}: {e}")
+                self._stop_event.wait(self.reopen_delay)
+                continue
+            logger.info(f"Connected to Arduino on {self.port} at {self.baudrate} baud")
+            try:
+                while not self._stop_event.is_set():
+                    raw = ser.readline()
+                    if not raw:
+                        continue  # read timeout, check for shutdown
+                    rfid = parse_scan_line(raw)
+                    if rfid is None:
+                        continue
+                    # Debounce: ignore if same RFID within 1 second
+                    if not self.debouncer.accept(rfid):
+                        logger.debug(f"Debounced duplicate RFID on {self.port}: {rfid}")
+                        continue
+                    logger.info(f"Scanned RFID on {self.port}: {rfid}")
+                    self.on_scan(rfid)
+            except (serial.SerialException, OSError) as e:
+                logger.error(f"Lost connection to {self.port}: {e}")
+                self._stop_event.wait(self.reopen_delay)
+            finally:
+                ser.close()
+                logger.info(f"Serial connection {self.port} closed")
+
+
+def listen_rfid(port='COM3', baudrate=9600, server='http://localhost:5000', action='toggle',
+                spool_path=DEFAULT_SPOOL, batch_size=50, flush_interval=0.5, token=None):
+    """
+    Listen for RFID scans from one or more Arduino readers.
+
     Args:
-        port: Serial port (e.g., 'COM3' on Windows, '/dev/ttyUSB0' on Linux)
+        port: Serial port or list of ports (e.g., 'COM3' on Windows, '/dev/ttyUSB0' on Linux)
         baudrate: Serial connection speed (default 9600)
         server: Base URL of Flask app (e.g., 'http://localhost:5000')
         action: 'toggle' (start/stop), 'start', or 'stop'
+        spool_path: File where undelivered scans are kept until the server is back
+        batch_size: Max scans per upload request
+        flush_interval: Seconds to wait for more scans before uploading a batch
+        token: Device token sent with every upload (needed if the server sets DEVICE_TOKEN_REQUIRED)
     """
+    ports = [port] if isinstance(port, str) else list(port)
+
+    sender = ScanSender(server, ScanSpool(spool_path), batch_size=batch_size, flush_interval=flush_interval,
+                        token=token)
+    sender.start()
+
+    # One reader thread per door; all share the sender queue
+    readers = [SerialReader(p, baudrate, lambda rfid: sender.submit(rfid, action)) for p in ports]
+    for reader in readers:
+        reader.start()
+    logger.info(f"Listening for RFID codes on {', '.join(ports)} (action={action})...")
+
     try:
-        ser = serial.Serial(port, baudrate, timeout=1)
-        logger.info(f"Connected to Arduino on {port} at {baudrate} baud")
-    except serial.SerialException as e:
-        logger.error(f"Failed to open {port}: {e}")
-        sys.exit(1)
-    
-    logger.info(f"Listening for RFID codes (action={action})...")
-    
-    last_rfid = None
-    last_time = time.time()
-    DEBOUNCE_SECONDS = 1  # Ignore duplicate scans within 1 second
-    
-    try:
-        while True:
-            if ser.in_waiting:
-                rfid = ser.readline().decode('utf-8', errors='ignore').strip()
-                
-                if not rfid or rfid.startswith('#'):
-                    continue
-                
-                now = time.time()
-                # Debounce: ignore if same RFID within 1 second
-                if rfid == last_rfid and (now - last_time) < DEBOUNCE_SECONDS:
-                    logger.debug(f"Debounced duplicate RFID: {rfid}")
-                    continue
-                
-                last_rfid = rfid
-                last_time = now
-                
-                logger.info(f"Scanned RFID: {rfid}")
-                
-                # Determine which endpoint to call
-                if action == 'start':
-                    endpoint = '/time/start_by_rfid'
-                elif action == 'stop':
-                    endpoint = '/time/stop_by_rfid'
-                else:  # toggle
-                    # Try to stop first; if fails, start
-                    try:
-                        resp = requests.post(f"{server}/time/stop_by_rfid", json={'rfid': rfid}, timeout=2)
-                        if resp.status_code == 200:
-                            logger.info(f"✓ Timer stopped: {resp.json()}")
-                            continue
-                    except Exception as e:
-                        logger.debug(f"Stop failed: {e}")
-                    endpoint = '/time/start_by_rfid'
-                
-                # Send to Flask app
-                try:
-                    resp = requests.post(f"{server}{endpoint}", json={'rfid': rfid}, timeout=2)
-                    if resp.status_code == 200:
-                        data = resp.json()
-                        logger.info(f"✓ {data.get('message', 'OK')}")
-                    else:
-                        logger.warning(f"Server error ({resp.status_code}): {resp.json().get('error', 'Unknown')}")
-                except requests.exceptions.RequestException as e:
-                    logger.error(f"Failed to reach server: {e}")
-    
+        while any(r.is_alive() for r in readers):
+            time.sleep(1)
     except KeyboardInterrupt:
         logger.info("Shutting down...")
     finally:
-        ser.close()
-        logger.info("Serial connection closed")
+        for reader in readers:
+            reader.stop()
+        for reader in readers:
+            reader.join(timeout=2)
+        sender.stop()
+        sender.join(timeout=sender.timeout + 1)
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='RFID listener for time logging')
-    parser.add_argument('--port', default='COM3', help='Serial port (default: COM3)')
+    parser.add_argument('--port', nargs='+', default=['COM3'],
+                        help='Serial port(s), one per door reader (default: COM3)')
     parser.add_argument('--baud', type=int, default=9600, help='Baud rate (default: 9600)')
     parser.add_argument('--server', default='http://localhost:5000', help='Flask server URL')
     parser.add_argument('--action', choices=['start', 'stop', 'toggle'], default='toggle',
                         help='Action: start, stop, or toggle (default)')
-    
+    parser.add_argument('--spool', default=DEFAULT_SPOOL, help='Offline spool file for undelivered scans')
+    parser.add_argument('--batch-size', type=int, default=50, help='Max scans per upload (default: 50)')
+    parser.add_argument('--flush-interval', type=float, default=0.5,
+                        help='Seconds to collect scans before uploading (default: 0.5)')
+    parser.add_argument('--token', default=os.environ.get('RFID_DEVICE_TOKEN'),
+                        help='Device token for the server (default: $RFID_DEVICE_TOKEN)')
+
     args = parser.parse_args()
-    listen_rfid(port=args.port, baudrate=args.baud, server=args.server, action=args.action)
+    listen_rfid(port=args.port, baudrate=args.baud, server=args.server, action=args.action,
+                spool_path=args.spool, batch_size=args.batch_size, flush_interval=args.flush_interval,
+                token=args.token)
@@ -0,0 +1,27 @@
+"""
+Backfill/rebuild the DailyTotal rollup from TimeEntry history.
+
+Usage:
+  python rebuild_daily_totals.py              # rebuild for all users
+  python rebuild_daily_totals.py --user 3 7   # rebuild only some users
+
+Creates the daily_total table if it does not exist yet. Run once after
+deploying the rollup, and again whenever time entries are changed by hand.
+"""
+import argparse
+
+from traveltogetherapp import create_app
+from traveltogetherapp.models import db, DailyTotal
+from traveltogetherapp.rollup import rebuild
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild DailyTotal rollup rows')
+    parser.add_argument('--user', type=int, nargs='+', dest='user_ids',
+                        help='Only rebuild these user ids (default: all users)')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        DailyTotal.__table__.create(db.engine, checkfirst=True)
+        count = rebuild(args.user_ids)
+        print(f'Rebuilt {count} daily total rows.')
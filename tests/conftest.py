@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the app like the root scripts do
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App on a fresh SQLite database in tmp_path, with the tables created."""
+    from config import Config
+    from traveltogetherapp import create_app
+    from traveltogetherapp.models import db
+    from traveltogetherapp.rfid_cache import rfid_cache
+    from traveltogetherapp.user_cache import user_cache
+
+    saved = Config.SQLALCHEMY_DATABASE_URI
+    Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "app.db"}'
+    try:
+        app = create_app()
+    finally:
+        Config.SQLALCHEMY_DATABASE_URI = saved
+    with app.app_context():
+        db.create_all()
+    rfid_cache.clear()
+    user_cache.clear()
+    return app
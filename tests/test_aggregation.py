@@ -0,0 +1,65 @@
+"""daily_totals(): per-day clipping, DailyAdjustment overrides and running entries."""
+from collections import namedtuple
+from datetime import date, datetime
+
+from traveltogetherapp.aggregation import Span, daily_totals
+
+Adjustment = namedtuple('Adjustment', 'user_id date total_minutes')
+Total = namedtuple('Total', 'user_id date seconds')
+
+
+def seconds(result, user_id):
+    return [d.seconds for d in result[user_id]]
+
+
+def test_entry_across_midnight_is_split_between_days():
+    entry = Span(1, datetime(2026, 3, 1, 22, 30), datetime(2026, 3, 2, 1, 15))
+    result = daily_totals([entry], date(2026, 3, 1), date(2026, 3, 3))
+    assert seconds(result, 1) == [90 * 60, 75 * 60, 0]
+    assert [d.date for d in result[1]] == [date(2026, 3, 1), date(2026, 3, 2), date(2026, 3, 3)]
+
+
+def test_entry_is_clipped_to_the_range():
+    entry = Span(1, datetime(2026, 2, 28, 20, 0), datetime(2026, 3, 2, 2, 0))
+    result = daily_totals([entry], date(2026, 3, 1), date(2026, 3, 1))
+    assert seconds(result, 1) == [24 * 3600]
+
+
+def test_adjustment_replaces_the_computed_day():
+    entries = [
+        Span(1, datetime(2026, 3, 1, 8, 0), datetime(2026, 3, 1, 12, 0)),
+        Span(1, datetime(2026, 3, 2, 8, 0), datetime(2026, 3, 2, 9, 0)),
+    ]
+    adjustments = [Adjustment(1, date(2026, 3, 1), 90)]
+    days = daily_totals(entries, date(2026, 3, 1), date(2026, 3, 2), adjustments)[1]
+    assert [(d.seconds, d.adjusted) for d in days] == [(90 * 60, True), (3600, False)]
+
+
+def test_adjustment_overrides_rollup_base_and_running_time():
+    now = datetime(2026, 3, 1, 15, 0)
+    running = [Span(1, datetime(2026, 3, 1, 14, 0), None)]
+    base = [Total(1, date(2026, 3, 1), 7200)]
+    adjustments = [Adjustment(1, date(2026, 3, 1), 30)]
+    days = daily_totals(running, date(2026, 3, 1), date(2026, 3, 1), adjustments, now=now, base=base)[1]
+    assert days[0].seconds == 30 * 60 and days[0].adjusted
+
+
+def test_running_entry_counts_up_to_now_across_midnight():
+    now = datetime(2026, 3, 2, 0, 45)
+    running = [Span(1, datetime(2026, 3, 1, 23, 0), None)]
+    result = daily_totals(running, date(2026, 3, 1), date(2026, 3, 2), now=now)
+    assert seconds(result, 1) == [3600, 45 * 60]
+
+
+def test_running_time_is_added_to_the_rollup_base():
+    now = datetime(2026, 3, 1, 10, 30)
+    running = [Span(1, datetime(2026, 3, 1, 10, 0), None)]
+    base = [Total(1, date(2026, 3, 1), 3600)]
+    result = daily_totals(running, date(2026, 3, 1), date(2026, 3, 1), now=now, base=base)
+    assert seconds(result, 1) == [3600 + 30 * 60]
+
+
+def test_requested_users_without_data_get_zero_days():
+    result = daily_totals([], date(2026, 3, 1), date(2026, 3, 2), user_ids=[1, 2])
+    assert seconds(result, 1) == [0, 0]
+    assert seconds(result, 2) == [0, 0]
@@ -0,0 +1,126 @@
+"""DailyTotal rollup: record_entry/rebuild agree, load_totals adds live data, stops count once."""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event
+
+from traveltogetherapp.aggregation import Span
+from traveltogetherapp.models import db, User, TimeEntry, DailyTotal, DailyAdjustment
+from traveltogetherapp.rollup import load_totals, rebuild, record_entry
+
+
+def add_user(email='a@example.com'):
+    user = User(email=email, password='x', role='editor')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def stored_totals(user_id):
+    rows = db.session.execute(
+        db.select(DailyTotal.date, DailyTotal.seconds).where(DailyTotal.user_id == user_id).order_by(DailyTotal.date)
+    ).all()
+    return [tuple(r) for r in rows]
+
+
+def login(app, user_id):
+    with app.app_context():
+        login_id = db.session.get(User, user_id).get_id()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = login_id
+        session['_fresh'] = True
+    return client
+
+
+def test_record_entry_splits_at_midnight_and_adds_up(app):
+    with app.app_context():
+        uid = add_user()
+        record_entry(Span(uid, datetime(2026, 3, 1, 23, 0), datetime(2026, 3, 2, 0, 30)))
+        record_entry(Span(uid, datetime(2026, 3, 2, 8, 0), datetime(2026, 3, 2, 9, 0)))
+        db.session.commit()
+        assert stored_totals(uid) == [(date(2026, 3, 1), 3600), (date(2026, 3, 2), 1800 + 3600)]
+
+
+def test_rebuild_matches_the_recorded_rollup(app):
+    with app.app_context():
+        uid = add_user()
+        other = add_user('b@example.com')
+        spans = [
+            Span(uid, datetime(2026, 3, 1, 22, 0), datetime(2026, 3, 2, 2, 0)),
+            Span(uid, datetime(2026, 3, 2, 10, 0), datetime(2026, 3, 2, 10, 45)),
+            Span(other, datetime(2026, 3, 1, 9, 0), datetime(2026, 3, 1, 17, 0)),
+        ]
+        for span in spans:
+            db.session.add(TimeEntry(user_id=span.user_id, start_time=span.start_time, end_time=span.end_time))
+            record_entry(span)
+        # Running entries are not part of the rollup
+        db.session.add(TimeEntry(user_id=uid, start_time=datetime(2026, 3, 3, 8, 0)))
+        db.session.commit()
+        recorded = stored_totals(uid), stored_totals(other)
+
+        assert rebuild([uid]) == 2
+        assert (stored_totals(uid), stored_totals(other)) == recorded
+        rebuild()
+        assert (stored_totals(uid), stored_totals(other)) == recorded
+
+
+def test_load_totals_adds_running_time_and_applies_adjustments(app):
+    with app.app_context():
+        uid = add_user()
+        db.session.add(TimeEntry(user_id=uid, start_time=datetime(2026, 3, 1, 8, 0), end_time=datetime(2026, 3, 1, 10, 0)))
+        db.session.add(TimeEntry(user_id=uid, start_time=datetime(2026, 3, 2, 8, 0), end_time=datetime(2026, 3, 2, 9, 0)))
+        db.session.add(TimeEntry(user_id=uid, start_time=datetime(2026, 3, 3, 23, 0)))
+        adjustment = DailyAdjustment(user_id=uid, date=date(2026, 3, 2), total_minutes=15, edited_by=uid)
+        db.session.add(adjustment)
+        db.session.commit()
+        rebuild()
+
+        days = load_totals([uid], date(2026, 3, 1), date(2026, 3, 4), [adjustment],
+                           now=datetime(2026, 3, 4, 1, 0))[uid]
+        assert [(d.seconds, d.adjusted) for d in days] == [
+            (7200, False),
+            (15 * 60, True),
+            (3600, False),  # running since 23:00
+            (3600, False),  # still running at 01:00
+        ]
+
+
+def test_web_stop_records_the_entry_once(app):
+    with app.app_context():
+        uid = add_user()
+        db.session.add(TimeEntry(user_id=uid, start_time=datetime.utcnow() - timedelta(hours=1)))
+        db.session.commit()
+    client = login(app, uid)
+
+    assert client.post('/time/stop').status_code == 302
+    assert client.post('/time/stop').status_code == 302  # nothing left to stop
+    with app.app_context():
+        assert 3590 <= sum(s for _, s in stored_totals(uid)) <= 3610
+
+
+def test_concurrent_web_stops_count_the_entry_once(app):
+    with app.app_context():
+        uid = add_user()
+        db.session.add(TimeEntry(user_id=uid, start_time=datetime.utcnow() - timedelta(hours=1)))
+        db.session.commit()
+        engine = db.engine
+    first, second = login(app, uid), login(app, uid)
+
+    raced = []
+
+    def stop_in_between(conn, cursor, statement, *args):
+        # The second stop closes the entry after the first one has read it as running
+        if statement.startswith('UPDATE time_entry') and not raced:
+            raced.append(True)
+            assert second.post('/time/stop').status_code == 302
+
+    event.listen(engine, 'before_cursor_execute', stop_in_between)
+    try:
+        assert first.post('/time/stop').status_code == 302
+    finally:
+        event.remove(engine, 'before_cursor_execute', stop_in_between)
+
+    assert raced
+    with app.app_context():
+        assert 3590 <= sum(s for _, s in stored_totals(uid)) <= 3610
+        assert db.session.scalar(db.select(db.func.count()).select_from(TimeEntry).where(TimeEntry.end_time == None)) == 0
@@ -0,0 +1,78 @@
+"""/timelogs must load with a fixed number of SQL queries, however many editors there are."""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from config import Config
+
+# users, adjustments, daily totals, running entries (+ the login user on a cold cache)
+MAX_QUERIES = 5
+
+
+def make_app(db_path):
+    saved = Config.SQLALCHEMY_DATABASE_URI
+    Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+    try:
+        from traveltogetherapp import create_app
+        return create_app()
+    finally:
+        Config.SQLALCHEMY_DATABASE_URI = saved
+
+
+def seed(db, editors):
+    from traveltogetherapp.models import User, TimeEntry, DailyAdjustment
+    from traveltogetherapp.rollup import rebuild
+
+    now = datetime.utcnow()
+    users = [User(email=f'ed{i}@example.com', password='x', role='editor', alias=f'Ed {i}') for i in range(editors)]
+    db.session.add_all(users)
+    db.session.flush()
+    for u in users:
+        for day in range(1, 8):
+            start = now - timedelta(days=day, hours=4)
+            db.session.add(TimeEntry(user_id=u.id, start_time=start, end_time=start + timedelta(hours=2)))
+        db.session.add(TimeEntry(user_id=u.id, start_time=now - timedelta(minutes=30)))
+        db.session.add(DailyAdjustment(user_id=u.id, date=now.date(), total_minutes=60, edited_by=u.id))
+    db.session.commit()
+    rebuild([u.id for u in users])
+    return users[0].id
+
+
+def count_queries(tmp_path, editors):
+    from traveltogetherapp.models import db, User
+    from traveltogetherapp.user_cache import user_cache
+
+    app = make_app(tmp_path / f'timelogs_{editors}.db')
+    with app.app_context():
+        db.create_all()
+        viewer = seed(db, editors)
+        login_id = db.session.get(User, viewer).get_id()
+        engine = db.engine
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = login_id
+        session['_fresh'] = True
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    user_cache.clear()
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        resp = client.get('/timelogs')
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert resp.status_code == 200
+    return len(statements)
+
+
+@pytest.mark.parametrize('editors', [3, 40])
+def test_timelogs_query_count_is_bounded(tmp_path, editors):
+    assert count_queries(tmp_path, editors) <= MAX_QUERIES
+
+
+def test_timelogs_query_count_does_not_grow_with_users(tmp_path):
+    assert count_queries(tmp_path, 3) == count_queries(tmp_path, 40)
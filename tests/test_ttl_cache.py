@@ -0,0 +1,46 @@
+"""TTLCache and the RFID cache's user index built on it."""
+import time
+
+from traveltogetherapp.rfid_cache import RfidCache, RfidUser
+from traveltogetherapp.ttl_cache import TTLCache
+
+
+def card(user_id):
+    return RfidUser(user_id, f'u{user_id}@example.com', None, None, None)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_size=2, ttl=30)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+
+
+def test_entries_expire_and_zero_disables_the_cache():
+    cache = TTLCache(ttl=0.01)
+    cache.put('a', 1)
+    time.sleep(0.02)
+    assert cache.get('a') is None and len(cache) == 0
+    cache.ttl = 0
+    cache.put('a', 1)
+    assert cache.get('a') is None
+
+
+def test_rfid_index_follows_replacement_eviction_and_invalidation():
+    cache = RfidCache(max_size=2, ttl=30)
+    cache.put('A', card(1))
+    cache.put('B', card(2))
+    cache.put('A2', card(1))  # user 1 got a new card
+    assert cache.get('A') is None and cache.get('A2').user_id == 1
+
+    cache.put('C', card(3))  # evicts B
+    assert cache.get('B') is None
+    cache.invalidate_user(1)
+    assert cache.get('A2') is None
+    assert cache._by_user == {3: 'C'}
+
+    cache.put('C', card(4))  # card moved to another user
+    cache.invalidate_user(3)
+    assert cache.get('C').user_id == 4
@@ -1,19 +1,63 @@
 # -*- coding: utf-8 -*-
+import hmac
 import os
 from flask import Flask, render_template
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from .models import db, User
+from .models import db, User, session_id
 from . import models  # Ensure models are imported
+from .rfid_cache import rfid_cache
+from .whitelist import role_policy
+from .user_cache import user_cache, SessionUser
+from .metrics import instrumentation
+from .passwords import password_hasher
+from .events import timer_events
+from .device_tokens import device_tokens, check_device_session
+from .warmup import database_ready
+from .database import engine_options, install_sqlite_pragmas
 
 # Set up login manager
 login_manager = LoginManager()
 login_manager.login_view = "auth.login"
 
+def _session_user(user_id):
+    """Slim cached copy of a user (see user_cache), or None."""
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+    row = db.session.execute(
+        db.select(User.id, User.email, User.alias, User.role, User.rfid, User.session_version).where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None
+    user = SessionUser(row.id, row.email, row.alias, row.role, row.rfid, session_id(row.id, row.session_version))
+    user_cache.put(user)
+    return user
+
+
 @login_manager.user_loader
-def load_user(user_id):
-    """Load user from database for login."""
-    return db.session.get(User, int(user_id))
+def load_user(login_id):
+    """Load user for login from "<id>:<session version>" (session or remember-me cookie).
+
+    Ids from before a password change (or without a version) are refused.
+    """
+    user_id, _, _ = login_id.partition(":")
+    if not user_id.isdigit():
+        return None
+    user = _session_user(int(user_id))
+    if user is None or not hmac.compare_digest(user.login_id, login_id):
+        return None
+    return user
+
+
+@login_manager.request_loader
+def load_user_from_request(request):
+    """Kiosk clients may send a device token header instead of a session cookie."""
+    token = device_tokens.token_from_request()
+    device = device_tokens.verify(token) if token else None
+    if device is None or device.user_id is None:
+        return None
+    return _session_user(device.user_id)
 
 
 # Create Flask application
@@ -33,8 +77,18 @@ def create_app():
     app.config.from_object("config.Config")
 
     # Connect database and login manager
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config)
     db.init_app(app)
+    install_sqlite_pragmas(app)
+    instrumentation.init_app(app)
     login_manager.init_app(app)
+    rfid_cache.init_app(app)
+    user_cache.init_app(app)
+    role_policy.init_app(app)
+    password_hasher.init_app(app)
+    timer_events.init_app(app)
+    device_tokens.init_app(app)
+    app.before_request(check_device_session)
 
     # Register blueprint modules
     from .auth import auth_bp
@@ -45,4 +99,11 @@ def create_app():
     def index():
         return render_template("main_page.html")
 
+    # Readiness check for the proxy / fly.io health checks
+    @app.route("/ready")
+    def ready():
+        if not database_ready():
+            return {"status": "unavailable"}, 503
+        return {"status": "ready"}
+
     return app
@@ -0,0 +1,96 @@
+"""Shared per-day time aggregation.
+
+All reporting views need the same thing: take a batch of time entries, clip
+each one to the calendar days (UTC) it overlaps and sum seconds per user and
+day, with manual DailyAdjustment rows overriding the computed value.
+
+Instead of looping over every entry once per day, each entry is walked only
+across the days it actually touches, so the cost is O(entries + days) rather
+than O(entries * days).
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+ONE_DAY = timedelta(days=1)
+
+# Minimal stand-in for a TimeEntry when only the interval is known
+Span = namedtuple("Span", "user_id start_time end_time")
+
+# seconds: total for the day, adjusted: True when a DailyAdjustment overrides it
+DayTotal = namedtuple("DayTotal", "date seconds adjusted")
+
+
+def day_start(d):
+    """Return the naive UTC datetime at midnight of date ``d``."""
+    return datetime(d.year, d.month, d.day)
+
+
+def daily_totals(entries, start_date, end_date, adjustments=(), user_ids=(), now=None, base=()):
+    """Sum time per user and day for ``start_date``..``end_date`` (inclusive).
+
+    entries: iterable of objects with ``user_id``, ``start_time`` and
+        ``end_time`` (TimeEntry instances or column rows). Running entries
+        (``end_time`` is None) are counted up to ``now``.
+    adjustments: iterable of objects with ``user_id``, ``date`` and
+        ``total_minutes`` (DailyAdjustment). They replace the computed total.
+    user_ids: users that should always get a result, even without data.
+    base: iterable of objects with ``user_id``, ``date`` and ``seconds``
+        (DailyTotal rollup rows) that are added to the computed totals.
+
+    Returns ``{user_id: [DayTotal, ...]}`` with one DayTotal per day in range.
+    """
+    now = now or datetime.utcnow()
+    n_days = (end_date - start_date).days + 1
+    if n_days <= 0:
+        return {uid: [] for uid in user_ids}
+    range_start = day_start(start_date)
+    range_end = range_start + timedelta(days=n_days)
+
+    seconds = {uid: [0] * n_days for uid in user_ids}
+    overrides = {}
+    for a in adjustments:
+        idx = (a.date - start_date).days
+        if 0 <= idx < n_days:
+            overrides[(a.user_id, idx)] = a.total_minutes * 60
+            seconds.setdefault(a.user_id, [0] * n_days)
+
+    for t in base:
+        idx = (t.date - start_date).days
+        if 0 <= idx < n_days:
+            seconds.setdefault(t.user_id, [0] * n_days)[idx] += t.seconds
+
+    for e in entries:
+        s = max(e.start_time, range_start)
+        en = min(e.end_time or now, range_end)
+        if en <= s:
+            continue
+        per_day = seconds.get(e.user_id)
+        if per_day is None:
+            per_day = seconds[e.user_id] = [0] * n_days
+        # Walk only the day boundaries this entry crosses
+        idx = (s.date() - start_date).days
+        boundary = day_start(s.date()) + ONE_DAY
+        while s < en:
+            chunk_end = min(en, boundary)
+            per_day[idx] += int((chunk_end - s).total_seconds())
+            s = chunk_end
+            boundary += ONE_DAY
+            idx += 1
+
+    result = {}
+    for uid, per_day in seconds.items():
+        days = []
+        for idx, secs in enumerate(per_day):
+            d = start_date + timedelta(days=idx)
+            override = overrides.get((uid, idx))
+            if override is not None:
+                days.append(DayTotal(d, override, True))
+            else:
+                days.append(DayTotal(d, secs, False))
+        result[uid] = days
+    return result
+
+
+def format_hm(minutes):
+    """Format a minute count as ``HH:MM``."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
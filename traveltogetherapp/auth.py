@@ -1,14 +1,26 @@
 import csv
 import io
+import json
+import queue
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytz
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+from flask import Blueprint, render_template, redirect, url_for, request, flash, current_app, Response, stream_with_context, session
 from flask_login import login_user, logout_user, login_required, current_user
-# ...resten av koden beholdes...
-from flask import Blueprint, render_template, redirect, url_for, request, flash
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_login import login_user, logout_user, login_required, current_user
-from .models import db, User, TimeEntry
+from .models import db, User, TimeEntry, DailyTotal, DailyAdjustment, ProcessedScan, DeviceToken
 from .forms import RegisterForm, LoginForm, ProfileForm
-import re
-from datetime import datetime, timedelta
+from .aggregation import Span, day_start, format_hm
+from .rollup import load_totals, record_entry
+from .rfid_cache import rfid_cache, RfidUser
+from .whitelist import role_policy
+from .user_cache import user_cache
+from .passwords import password_hasher, HasherBusy
+from .events import timer_events
+from .device_tokens import device_tokens, device_auth
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -36,36 +48,11 @@ def set_rfid(user_id):
     else:
         user.rfid = None
     db.session.commit()
+    rfid_cache.invalidate_user(user.id)
+    user_cache.invalidate(user.id)
     flash('RFID updated.', 'success')
     return redirect(url_for('auth.profile_view', user_id=user_id))
-import csv
-import io
-from flask_login import login_user, logout_user, login_required, current_user
-# ...resten av koden beholdes...
-from flask import Blueprint, render_template, redirect, url_for, request, flash
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_login import login_user, logout_user, login_required, current_user
-from .models import db, User, TimeEntry
-from .forms import RegisterForm, LoginForm, ProfileForm
-import re
-from datetime import datetime, timedelta
 
-auth_bp = Blueprint("auth", __name__)
-
-## Fjernet duplikat/feilplassert set_rfid route. Korrekt definisjon beholdes lenger nede i filen hvis nødvendig.
-import csv
-import io
-from flask_login import login_user, logout_user, login_required, current_user
-# ...resten av koden beholdes...
-from flask import Blueprint, render_template, redirect, url_for, request, flash
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_login import login_user, logout_user, login_required, current_user
-from .models import db, User, TimeEntry
-from .forms import RegisterForm, LoginForm, ProfileForm
-import re
-from datetime import datetime, timedelta
-
-auth_bp = Blueprint("auth", __name__)
 
 # Simple email check (bypassing email_validator)
 EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
@@ -88,20 +75,13 @@ def register():
             flash("Email already registered.", "warning")
             return render_template("auth_register.html", form=form)
 
-        hashed_password = generate_password_hash(password)
-        # Determine role from whitelist
-        import os
-        root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-        whitelist_path = os.path.join(root_dir, 'whitelist.txt')
-        role = 'user'
         try:
-            if os.path.exists(whitelist_path):
-                with open(whitelist_path, 'r', encoding='utf-8') as wf:
-                    allowed = [l.strip().lower() for l in wf if l.strip()]
-                if email.lower() in allowed:
-                    role = 'editor'
-        except Exception:
-            role = 'user'
+            hashed_password = password_hasher.hash(password)
+        except HasherBusy:
+            flash("The server is busy, please try again in a moment.", "warning")
+            return render_template("auth_register.html", form=form), 503
+        # Determine role from whitelist (cached, reloaded when the file changes)
+        role = role_policy.role_for(email)
 
         user = User(email=email, password=hashed_password, role=role)
         db.session.add(user)
@@ -120,23 +100,108 @@ def login():
         email = form.email.data.strip()
         query = db.select(User).where(User.email == email)
         user = db.session.execute(query).scalar_one_or_none()
-        if not user or not check_password_hash(user.password, form.password.data):
+        try:
+            valid = user is not None and password_hasher.verify(user.password, form.password.data)
+        except HasherBusy:
+            flash("The server is busy, please try again in a moment.", "warning")
+            return render_template("auth_login.html", form=form), 503
+        if not valid:
             flash("Invalid email or password.", "danger")
             return render_template("auth_login.html", form=form)
-        login_user(user)
+        try:
+            if password_hasher.needs_rehash(user.password):
+                # Hash parameters changed since this password was set: upgrade it now
+                user.password = password_hasher.hash(form.password.data)
+                db.session.commit()
+                user_cache.invalidate(user.id)
+        except HasherBusy:
+            # The password is verified; upgrade the hash on a later login instead of failing this one
+            pass
+        login_user(user, remember=form.remember.data)
         return redirect(url_for("main_page"))
     return render_template("auth_login.html", form=form)
 
 
+@auth_bp.route("/device/login", methods=["GET", "POST"])
+def device_login():
+    """Sign a kiosk in with its device token instead of a password.
+
+    The session is permanent (PERMANENT_SESSION_LIFETIME), so the kiosk stays
+    signed in until the token is revoked.
+    """
+    if request.method == "POST":
+        device = device_tokens.verify(request.form.get("token", "").strip())
+        if device is None or device.user_id is None:
+            flash("Invalid or revoked device token.", "danger")
+            return render_template("device_login.html"), 401
+        user = db.session.get(User, device.user_id)
+        if user is None:
+            flash("The user for this device no longer exists.", "danger")
+            return render_template("device_login.html"), 401
+        session.permanent = True
+        login_user(user)
+        session["device_token_id"] = device.id
+        return redirect(url_for("main_page"))
+    return render_template("device_login.html")
+
+
 @auth_bp.route("/logout")
 @login_required
 def logout():
     logout_user()
+    session.pop("device_token_id", None)
     flash("Logged out successfully.", "success")
     return redirect(url_for("index"))
 
 
 # --- Profilvisning ---
+OSLO = pytz.timezone('Europe/Oslo')
+
+
+def _can_see_entries(user):
+    return current_user.id == user.id or getattr(current_user, 'role', None) == 'admin'
+
+
+def _format_entry(row, now):
+    """Template/JSON dict for an (id, start_time, end_time) row; times are naive UTC."""
+    start = pytz.utc.localize(row.start_time)
+    end = pytz.utc.localize(row.end_time) if row.end_time else None
+    secs = int(((row.end_time or now) - row.start_time).total_seconds())
+    return {
+        'id': row.id,
+        'start_iso': start.isoformat(),
+        'end_iso': end.isoformat() if end else '',
+        # server-side human readable (Europe/Oslo)
+        'start_fmt': start.astimezone(OSLO).strftime('%Y-%m-%d %H:%M'),
+        'end_fmt': end.astimezone(OSLO).strftime('%Y-%m-%d %H:%M') if end else 'running',
+        'seconds': secs,
+        'minutes': secs // 60,
+    }
+
+
+def _entry_page(user_id, before=None, limit=20):
+    """One page of a user's entries, newest first, read as a column projection.
+
+    before: cursor "<start_time iso>~<id>" from the previous page.
+    Returns (formatted entries, cursor for the next page or None).
+    """
+    q = db.select(TimeEntry.id, TimeEntry.start_time, TimeEntry.end_time).where(
+        TimeEntry.user_id == user_id
+    ).order_by(TimeEntry.start_time.desc(), TimeEntry.id.desc()).limit(limit + 1)
+    if before:
+        start_iso, _, entry_id = before.partition('~')
+        start = datetime.fromisoformat(start_iso)
+        q = q.where((TimeEntry.start_time < start) | ((TimeEntry.start_time == start) & (TimeEntry.id < int(entry_id))))
+    rows = db.session.execute(q).all()
+    now = datetime.utcnow()
+    entries = [_format_entry(r, now) for r in rows[:limit]]
+    cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        cursor = f"{last.start_time.isoformat()}~{last.id}"
+    return entries, cursor
+
+
 @auth_bp.route("/profile/<int:user_id>")
 @login_required
 def profile_view(user_id):
@@ -145,60 +210,42 @@ def profile_view(user_id):
         flash("User not found.", "danger")
         return redirect(url_for("index"))
 
-    # Compute today's total time (UTC) for the profile user
-    from datetime import datetime, timedelta
+    if not _can_see_entries(user):
+        return render_template("profile_view.html", user=user, today_seconds=0, timer_running=False, entries=[], next_cursor=None)
+
+    # Compute today's total time (UTC) for the profile user: rollup row + running entry
     today = datetime.utcnow().date()
-    day_start = datetime(today.year, today.month, today.day)
-    day_end = day_start + timedelta(days=1)
-
-    q = db.select(TimeEntry).where(
-        TimeEntry.user_id == user.id,
-        TimeEntry.start_time < day_end,
-        (TimeEntry.end_time == None) | (TimeEntry.end_time >= day_start),
-    ).order_by(TimeEntry.start_time.desc())
-    entries = db.session.execute(q).scalars().all()
-
-    total_minutes = 0
-    running = False
-    total_seconds = 0
-    for e in entries:
-        s = e.start_time
-        en = e.end_time or datetime.utcnow()
-        # Clip to today
-        if s < day_start:
-            s = day_start
-        if en > day_end:
-            en = day_end
-        delta = en - s
-        secs = int(delta.total_seconds())
-        total_seconds += secs
-        if e.end_time is None:
-            running = True
-
-    import pytz
-    oslo = pytz.timezone('Europe/Oslo')
-    formatted_entries = []
-    for e in entries:
-        s_raw = e.start_time
-        en_raw = e.end_time
-        s = s_raw.isoformat() if s_raw else ''
-        en = en_raw.isoformat() if en_raw else ''
-        # server-side human readable (Europe/Oslo)
-        s_fmt = s_raw.astimezone(oslo).strftime('%Y-%m-%d %H:%M') if s_raw else ''
-        en_fmt = en_raw.astimezone(oslo).strftime('%Y-%m-%d %H:%M') if en_raw else 'running'
-        secs = e.duration_seconds if getattr(e, 'duration_seconds', None) is not None else int(((en_raw or datetime.utcnow()) - s_raw).total_seconds())
-        mins = secs // 60
-        formatted_entries.append({
-            'start_iso': s,
-            'end_iso': en,
-            'start_fmt': s_fmt,
-            'end_fmt': en_fmt,
-            'seconds': secs,
-            'minutes': mins,
-        })
+    running = db.session.execute(
+        db.select(TimeEntry.user_id, TimeEntry.start_time, TimeEntry.end_time).where(
+            TimeEntry.user_id == user.id, TimeEntry.end_time == None
+        )
+    ).all()
+    totals = load_totals([user.id], today, today, running=running)
+    total_seconds = totals[user.id][0].seconds
 
-    return render_template("profile_view.html", user=user, today_seconds=total_seconds, timer_running=running, entries=formatted_entries)
+    # Only the newest page is rendered; older entries are fetched on demand
+    entries, next_cursor = _entry_page(user.id, limit=current_app.config.get('PROFILE_ENTRIES_PER_PAGE', 20))
 
+    return render_template("profile_view.html", user=user, today_seconds=total_seconds, timer_running=bool(running),
+                           entries=entries, next_cursor=next_cursor)
+
+
+@auth_bp.route("/profile/<int:user_id>/entries")
+@login_required
+def profile_entries(user_id):
+    """JSON page of older time entries for the profile page ("Load older")."""
+    user = db.session.get(User, user_id)
+    if not user:
+        return {'error': 'User not found'}, 404
+    if not _can_see_entries(user):
+        return {'error': 'Insufficient permissions'}, 403
+    per_page = current_app.config.get('PROFILE_ENTRIES_PER_PAGE', 20)
+    try:
+        limit = min(int(request.args.get('limit', per_page)), 100)
+        entries, next_cursor = _entry_page(user.id, request.args.get('before'), max(limit, 1))
+    except ValueError:
+        return {'error': 'Invalid cursor'}, 400
+    return {'entries': entries, 'next': next_cursor}
 
 
 @auth_bp.route("/profile/edit", methods=["GET", "POST"])
@@ -206,21 +253,23 @@ def profile_view(user_id):
 def profile_edit():
     # Profile editing logic
     form = ProfileForm(request.form if request.method == "POST" else None)
+    # current_user is a cached read-only copy; edit the real row
+    user = db.session.get(User, current_user.id)
     if request.method == "POST" and form.validate():
-        current_user.alias = form.alias.data.strip()
-        current_user.description = form.description.data
+        user.alias = form.alias.data.strip()
+        user.description = form.description.data
         
         # Handle RFID card registration
         rfid = request.form.get("rfid", "").strip()
         if rfid:
             # Check if RFID already taken by another user
             existing = db.session.execute(
-                db.select(User).where(User.rfid == rfid, User.id != current_user.id)
+                db.select(User).where(User.rfid == rfid, User.id != user.id)
             ).scalar_one_or_none()
             if existing:
                 flash("RFID card is already registered to another user.", "danger")
-                return render_template("profile_edit.html", form=form)
-        current_user.rfid = rfid if rfid else None
+                return render_template("profile_edit.html", form=form, user=user)
+        user.rfid = rfid if rfid else None
         
         # Handle password change
         new_password = request.form.get("new_password", "").strip()
@@ -229,28 +278,39 @@ def profile_edit():
         if new_password or confirm_password:
             if not new_password:
                 flash("Please enter a new password.", "danger")
-                return render_template("profile_edit.html", form=form)
+                return render_template("profile_edit.html", form=form, user=user)
             if new_password != confirm_password:
                 flash("Passwords do not match.", "danger")
-                return render_template("profile_edit.html", form=form)
+                return render_template("profile_edit.html", form=form, user=user)
             if len(new_password) < 6:
                 flash("Password must be at least 6 characters long.", "danger")
-                return render_template("profile_edit.html", form=form)
+                return render_template("profile_edit.html", form=form, user=user)
             
             # Update password
-            current_user.password_hash = generate_password_hash(new_password)
+            try:
+                user.password = password_hasher.hash(new_password)
+                user.session_version = (user.session_version or 0) + 1
+            except HasherBusy:
+                flash("The server is busy, please try again in a moment.", "warning")
+                return render_template("profile_edit.html", form=form, user=user), 503
             flash("Profile and password updated.", "success")
         else:
             flash("Profile updated.", "success")
         
         db.session.commit()
+        rfid_cache.invalidate_user(user.id)
+        user_cache.invalidate(user.id)
+        if new_password:
+            # The login id includes the session version: other sessions are now signed out, renew this one
+            remember = current_app.config.get("REMEMBER_COOKIE_NAME", "remember_token") in request.cookies
+            login_user(user, remember=remember)
         return redirect(url_for("index"))
     
     # Prefill form on GET
     if request.method == "GET":
-        form.description.data = current_user.description
-        form.alias.data = current_user.alias
-    return render_template("profile_edit.html", form=form)
+        form.description.data = user.description
+        form.alias.data = user.alias
+    return render_template("profile_edit.html", form=form, user=user)
 
 
 @auth_bp.route('/time/start', methods=['POST', 'GET'])
@@ -263,9 +323,17 @@ def start_time():
         flash('Timer already running.', 'warning')
         return redirect(url_for('auth.profile_view', user_id=current_user.id))
 
-    entry = TimeEntry(user_id=current_user.id)
+    entry = TimeEntry(user_id=current_user.id, start_time=datetime.utcnow())
+    started_at = entry.start_time
     db.session.add(entry)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        flash('Timer already running.', 'warning')
+        return redirect(url_for('auth.profile_view', user_id=current_user.id))
+    rfid_cache.invalidate_user(current_user.id)
+    _publish_timer('started', current_user.id, current_user.alias or current_user.email, started_at)
     flash('Timer started.', 'success')
     return redirect(url_for('auth.profile_view', user_id=current_user.id))
 
@@ -273,21 +341,141 @@ def start_time():
 @auth_bp.route('/time/stop', methods=['POST', 'GET'])
 @login_required
 def stop_time():
-    running_q = db.select(TimeEntry).where(TimeEntry.user_id == current_user.id, TimeEntry.end_time == None)
-    running = db.session.execute(running_q).scalar_one_or_none()
+    running_q = db.select(TimeEntry.id, TimeEntry.start_time).where(
+        TimeEntry.user_id == current_user.id, TimeEntry.end_time == None
+    )
+    running = db.session.execute(running_q).first()
+    stopped_at = datetime.utcnow()
+    # Guarded like _stop_running: only the request that closes the entry adds it to the rollup
+    if running:
+        result = db.session.execute(
+            db.update(TimeEntry)
+            .where(TimeEntry.id == running.id, TimeEntry.end_time == None)
+            .values(end_time=stopped_at)
+        )
+        if result.rowcount != 1:
+            db.session.rollback()
+            running = None
     if not running:
         flash('No running timer found.', 'warning')
         return redirect(url_for('auth.profile_view', user_id=current_user.id))
 
-    from datetime import datetime
-    running.end_time = datetime.utcnow()
-    delta = running.end_time - running.start_time
-    running.duration_seconds = int(delta.total_seconds())
+    started_at = running.start_time
+    record_entry(Span(current_user.id, started_at, stopped_at))
     db.session.commit()
+    rfid_cache.invalidate_user(current_user.id)
+    _publish_timer('stopped', current_user.id, current_user.alias or current_user.email, stopped_at, started_at)
     flash('Timer stopped.', 'success')
     return redirect(url_for('auth.profile_view', user_id=current_user.id))
 
 
+def _publish_timer(kind, user_id, name, at, started=None):
+    """Tell open /time/stream connections in this process that a timer changed."""
+    event = {'type': kind, 'user_id': user_id, 'name': name, 'at': at.isoformat() + 'Z'}
+    if started is not None:
+        event['duration'] = int((at - started).total_seconds())
+    timer_events.publish(event)
+
+
+def _timer_snapshot(user_ids=None):
+    """Today's closed seconds and running start per user, for /time/stream.
+
+    user_ids=None means every user. Reads the DailyTotal rollup plus the
+    running entries, so it is two small queries regardless of history size.
+    """
+    today = datetime.utcnow().date()
+    users_q = db.select(User.id, User.email, User.alias)
+    closed_q = db.select(DailyTotal.user_id, DailyTotal.seconds).where(DailyTotal.date == today)
+    running_q = db.select(TimeEntry.user_id, TimeEntry.start_time).where(TimeEntry.end_time == None)
+    if user_ids is not None:
+        users_q = users_q.where(User.id.in_(user_ids))
+        closed_q = closed_q.where(DailyTotal.user_id.in_(user_ids))
+        running_q = running_q.where(TimeEntry.user_id.in_(user_ids))
+    closed = dict(db.session.execute(closed_q).all())
+    running = dict(db.session.execute(running_q).all())
+    users = {}
+    for u in db.session.execute(users_q):
+        if user_ids is None and u.id not in running and u.id not in closed:
+            continue  # overview only lists people with time today
+        since = running.get(u.id)
+        users[str(u.id)] = {
+            'name': u.alias or u.email,
+            'closed_seconds': closed.get(u.id, 0),
+            # A timer started before midnight only counts from midnight today
+            'running_since': max(since, day_start(today)).isoformat() + 'Z' if since else None,
+        }
+    return {'type': 'snapshot', 'day': today.isoformat(), 'users': users}
+
+
+def _sse(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+@auth_bp.route('/time/stream')
+@login_required
+def time_stream():
+    """Server-sent events with live timer status.
+
+    ?user_id=N follows one user (the owner or an admin); without it every
+    user is followed, which requires an editor. The stream starts with a
+    snapshot, then pushes started/stopped events as they happen. Events only
+    cross the workers of this process, so the snapshot is re-sent every
+    SSE_RESYNC_SECONDS; the connection closes after SSE_MAX_SECONDS and the
+    browser's EventSource reconnects by itself.
+
+    Every open stream holds a server thread. Beyond SSE_MAX_STREAMS per
+    process the client gets the snapshot and a retry delay of
+    SSE_RESYNC_SECONDS instead, i.e. it polls until a slot is free, so open
+    tabs cannot starve badge scans and page loads.
+    """
+    user_id = request.args.get('user_id', type=int)
+    if user_id is None:
+        if not current_user.is_editor():
+            return {'error': 'Insufficient permissions'}, 403
+        user_ids = None
+    else:
+        if current_user.id != user_id and getattr(current_user, 'role', None) != 'admin':
+            return {'error': 'Insufficient permissions'}, 403
+        user_ids = [user_id]
+
+    cfg = current_app.config
+    heartbeat = cfg.get('SSE_HEARTBEAT_SECONDS', 15)
+    resync = cfg.get('SSE_RESYNC_SECONDS', 30)
+    max_age = cfg.get('SSE_MAX_SECONDS', 300)
+
+    def generate():
+        with timer_events.subscribe() as events:
+            if events is None:
+                yield f"retry: {int(resync * 1000)}\n{_sse(_timer_snapshot(user_ids))}"
+                return
+            opened = last_sync = time.monotonic()
+            yield f"retry: 3000\n{_sse(_timer_snapshot(user_ids))}"
+            # Don't hold a pooled connection while idling between events
+            db.session.remove()
+            while True:
+                now = time.monotonic()
+                if now - opened >= max_age:
+                    return
+                if now - last_sync >= resync:
+                    last_sync = now
+                    yield _sse(_timer_snapshot(user_ids))
+                    db.session.remove()
+                    continue
+                try:
+                    event = events.get(timeout=min(heartbeat, resync - (now - last_sync)))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if user_ids is None or event['user_id'] in user_ids:
+                    yield _sse(event)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
 @auth_bp.route('/profile/<int:user_id>/set_role', methods=['POST'])
 @login_required
 def set_role(user_id):
@@ -309,9 +497,77 @@ def set_role(user_id):
 
     target.role = new_role
     db.session.commit()
+    rfid_cache.invalidate_user(target.id)
+    user_cache.invalidate(target.id)
     flash(f"Updated role for {target.email} to {new_role}.", 'success')
     return redirect(url_for('auth.profile_view', user_id=user_id))
 
+@auth_bp.route('/admin')
+@login_required
+def admin():
+    """Admin page: editor whitelist and device tokens."""
+    if getattr(current_user, 'role', None) != 'admin':
+        flash('Insufficient permissions.', 'danger')
+        return redirect(url_for('index'))
+    devices = db.session.execute(
+        db.select(DeviceToken, User.email).outerjoin(User, User.id == DeviceToken.user_id).order_by(DeviceToken.id)
+    ).all()
+    return render_template('admin.html', editors=role_policy.editors(), devices=devices)
+
+
+@auth_bp.route('/admin/whitelist/reload', methods=['POST'])
+@login_required
+def whitelist_reload():
+    """Re-read whitelist.txt without waiting for the mtime check."""
+    if getattr(current_user, 'role', None) != 'admin':
+        flash('Insufficient permissions.', 'danger')
+        return redirect(url_for('index'))
+    count = role_policy.reload()
+    flash(f"Whitelist reloaded ({count} editor emails).", 'success')
+    return redirect(url_for('auth.admin'))
+
+
+@auth_bp.route('/admin/devices', methods=['POST'])
+@login_required
+def device_create():
+    """Issue a device token for a kiosk or RFID listener.
+
+    Form fields: 'name', and 'email' of the user a kiosk signs in as (empty for
+    a scanner). The token is shown once; only its hash is stored.
+    """
+    if getattr(current_user, 'role', None) != 'admin':
+        flash('Insufficient permissions.', 'danger')
+        return redirect(url_for('index'))
+    name = request.form.get('name', '').strip()
+    email = request.form.get('email', '').strip()
+    if not name:
+        flash('Device name is required.', 'danger')
+        return redirect(url_for('auth.admin'))
+    user_id = None
+    if email:
+        user_id = db.session.execute(db.select(User.id).where(User.email == email)).scalar_one_or_none()
+        if user_id is None:
+            flash(f"No user with email {email}.", 'danger')
+            return redirect(url_for('auth.admin'))
+    row, token = device_tokens.issue(name, user_id)
+    flash(f"Device token for {row.name} (id {row.id}), shown only once: {token}", 'success')
+    return redirect(url_for('auth.admin'))
+
+
+@auth_bp.route('/admin/devices/<int:token_id>/revoke', methods=['POST'])
+@login_required
+def device_revoke(token_id):
+    """Revoke a device token; kiosk sessions opened with it are signed out."""
+    if getattr(current_user, 'role', None) != 'admin':
+        flash('Insufficient permissions.', 'danger')
+        return redirect(url_for('index'))
+    if device_tokens.revoke(token_id):
+        flash(f"Device token {token_id} revoked.", 'success')
+    else:
+        flash(f"No active device token with id {token_id}.", 'warning')
+    return redirect(url_for('auth.admin'))
+
+
 @auth_bp.route('/timelogs')
 @login_required
 def timelogs():
@@ -320,7 +576,6 @@ def timelogs():
         flash('Insufficient permissions.', 'danger')
         return redirect(url_for('index'))
 
-    from .models import DailyAdjustment
     today = datetime.utcnow().date()
     # Finn siste søndag (eller i dag hvis søndag)
     weekday_today = today.weekday()
@@ -328,56 +583,46 @@ def timelogs():
     week_start = last_sunday + timedelta(days=1)
     week_end = today
     users = db.session.execute(db.select(User).where(User.role == 'editor')).scalars().all()
+    user_ids = [u.id for u in users]
+    # Hent justeringer og dagstotaler for alle brukere samlet (ikke per bruker)
+    adjustments = db.session.execute(
+        db.select(DailyAdjustment).where(
+            DailyAdjustment.user_id.in_(user_ids),
+            DailyAdjustment.date >= week_start,
+            DailyAdjustment.date <= week_end
+        )
+    ).scalars().all()
+    totals = load_totals(user_ids, week_start, week_end, adjustments)
+
     rows = []
     for u in users:
-        adjustments = {a.date.isoformat(): a for a in db.session.execute(
-            db.select(DailyAdjustment).where(
-                DailyAdjustment.user_id == u.id,
-                DailyAdjustment.date >= week_start,
-                DailyAdjustment.date <= week_end
-            )
-        ).scalars()}
-        q = db.select(TimeEntry).where(
-            TimeEntry.user_id == u.id,
-            TimeEntry.start_time < week_end + timedelta(days=1),
-            (TimeEntry.end_time == None) | (TimeEntry.end_time >= week_start),
-        )
-        entries = db.session.execute(q).scalars().all()
-        per_day = []
-        week_total = 0
-        days_with_time = 0
-        for i in range((week_end - week_start).days + 1):
-            d = week_start + timedelta(days=i)
-            d_iso = d.isoformat()
-            day_start = datetime(d.year, d.month, d.day)
-            day_end = day_start + timedelta(days=1)
-            if d_iso in adjustments:
-                minutes = adjustments[d_iso].total_minutes
-            else:
-                minutes = 0
-                for e in entries:
-                    s = e.start_time
-                    en = e.end_time or datetime.utcnow()
-                    if s < day_start:
-                        s = day_start
-                    if en > day_end:
-                        en = day_end
-                    delta = en - s
-                    if delta.total_seconds() > 0:
-                        minutes += int(delta.total_seconds() // 60)
-            if minutes > 0:
-                days_with_time += 1
-            week_total += max(0, minutes)
-        week_total = max(0, week_total)
+        day_minutes = [d.seconds // 60 for d in totals[u.id]]
+        week_total = sum(day_minutes)
+        days_with_time = sum(1 for m in day_minutes if m > 0)
         avg_minutes = int(week_total / days_with_time) if days_with_time > 0 else 0
-        avg_hh = avg_minutes // 60
-        avg_mm = avg_minutes % 60
-        hh = week_total // 60
-        mm = week_total % 60
-        rows.append({'user': u, 'hm': f"{hh:02d}:{mm:02d}", 'total_minutes': week_total, 'avg': f"{avg_hh:02d}:{avg_mm:02d}"})
+        rows.append({'user': u, 'hm': format_hm(week_total), 'total_minutes': week_total, 'avg': format_hm(avg_minutes)})
 
     return render_template('timelogs_main.html', rows=rows)
 
+
+def _week_view(week_start, week_end, days):
+    """Build the template dict for one week from a list of DayTotal rows."""
+    per_day = []
+    week_total = 0
+    for d in days:
+        minutes = d.seconds // 60
+        per_day.append({
+            'date': d.date.isoformat(),
+            'weekday': d.date.strftime('%A'),
+            'hours': minutes // 60,
+            'minutes': minutes % 60,
+            'total_minutes': minutes,
+            'source': 'justert' if d.adjusted else 'automatisk',
+        })
+        week_total += minutes
+    return {'week_start': week_start, 'week_end': week_end, 'per_day': per_day, 'week_total': format_hm(week_total)}
+
+
 @auth_bp.route('/timelogs/<int:user_id>', methods=['GET', 'POST'])
 @login_required
 def timelogs_user(user_id):
@@ -385,8 +630,6 @@ def timelogs_user(user_id):
         flash('Insufficient permissions.', 'danger')
         return redirect(url_for('index'))
 
-    
-    from .models import DailyAdjustment
     today = datetime.utcnow().date()
     user = db.session.get(User, user_id)
     if not user:
@@ -429,120 +672,293 @@ def timelogs_user(user_id):
     last_sunday = today - timedelta(days=(weekday_today + 1) % 7)
     # Finn første dag vi har data for (første TimeEntry eller DailyAdjustment)
     first_entry = db.session.execute(
-        db.select(TimeEntry).where(TimeEntry.user_id == user.id).order_by(TimeEntry.start_time.asc())
-    ).scalars().first()
+        db.select(db.func.min(TimeEntry.start_time)).where(TimeEntry.user_id == user.id)
+    ).scalar()
     first_adjustment = db.session.execute(
-        db.select(DailyAdjustment).where(DailyAdjustment.user_id == user.id).order_by(DailyAdjustment.date.asc())
-    ).scalars().first()
-    if first_entry and first_adjustment:
-        first_date = min(first_entry.start_time.date(), first_adjustment.date)
-    elif first_entry:
-        first_date = first_entry.start_time.date()
-    elif first_adjustment:
-        first_date = first_adjustment.date
-    else:
-        first_date = today
+        db.select(db.func.min(DailyAdjustment.date)).where(DailyAdjustment.user_id == user.id)
+    ).scalar()
+    candidates = [d for d in (first_entry.date() if first_entry else None, first_adjustment) if d]
+    first_date = min(candidates) if candidates else today
+
+    # Paginering: vis de nyeste hele ukene, eldre uker via ?before=<søndag>
+    per_page = current_app.config.get('TIMELOGS_WEEKS_PER_PAGE', 8)
+    newest_end = last_sunday
+    before = request.args.get('before')
+    if before:
+        try:
+            newest_end = min(datetime.strptime(before[:10], '%Y-%m-%d').date(), last_sunday)
+        except ValueError:
+            pass
+        newest_end -= timedelta(days=(newest_end.weekday() + 1) % 7)
+    available = max(((newest_end - first_date).days + 1) // 7, 0)
+    n_weeks = min(per_page, available)
+    range_start = newest_end - timedelta(days=7 * n_weeks - 1)
+    # Pågående uke (søndag ikke passert) vises bare på første side
+    range_end = today if newest_end == last_sunday else newest_end
 
-    # Lag alle hele uker fra siste søndag og bakover til første data
     weeks = []
-    week_end = last_sunday
-    while week_end - timedelta(days=6) >= first_date:
-        week_start = week_end - timedelta(days=6)
-        # Hent alle justeringer for denne uken
-        adjustments = {a.date.isoformat(): a for a in db.session.execute(
-            db.select(DailyAdjustment).where(DailyAdjustment.user_id == user.id, DailyAdjustment.date >= week_start, DailyAdjustment.date <= week_end)
-        ).scalars()}
-        # Hent alle time entries for denne uken
-        q = db.select(TimeEntry).where(
-            TimeEntry.user_id == user.id,
-            TimeEntry.start_time < week_end + timedelta(days=1),
-            (TimeEntry.end_time == None) | (TimeEntry.end_time >= week_start),
-        )
-        entries = db.session.execute(q).scalars().all()
-        per_day = []
-        week_total = 0
-        for i in range(7):
-            d = week_start + timedelta(days=i)
-            d_iso = d.isoformat()
-            day_start = datetime(d.year, d.month, d.day)
-            day_end = day_start + timedelta(days=1)
-            if d_iso in adjustments:
-                minutes = adjustments[d_iso].total_minutes
-                source = 'justert'
-            else:
-                minutes = 0
-                for e in entries:
-                    s = e.start_time
-                    en = e.end_time or datetime.utcnow()
-                    if s < day_start:
-                        s = day_start
-                    if en > day_end:
-                        en = day_end
-                    delta = en - s
-                    minutes += int(delta.total_seconds() // 60)
-                source = 'automatisk'
-            hours = minutes // 60
-            mins = minutes % 60
-            per_day.append({'date': d_iso, 'weekday': d.strftime('%A'), 'hours': hours, 'minutes': mins, 'total_minutes': minutes, 'source': source})
-            week_total += minutes
-        hh = week_total // 60
-        mm = week_total % 60
-        week_total_fmt = f"{hh:02d}:{mm:02d}"
-        weeks.append({'week_start': week_start, 'week_end': week_end, 'per_day': per_day, 'week_total': week_total_fmt})
-        week_end -= timedelta(days=7)
-
-    # Legg til pågående uke hvis den ikke er ferdig (søndag ikke passert)
-    # Sjekk om siste uke slutter før i dag
-    ongoing_start = last_sunday + timedelta(days=1)
-    if ongoing_start <= today:
-        ongoing_end = today
-        week_start = ongoing_start
-        week_end = ongoing_end
-        adjustments = {a.date.isoformat(): a for a in db.session.execute(
-            db.select(DailyAdjustment).where(DailyAdjustment.user_id == user.id, DailyAdjustment.date >= week_start, DailyAdjustment.date <= week_end)
-        ).scalars()}
-        q = db.select(TimeEntry).where(
-            TimeEntry.user_id == user.id,
-            TimeEntry.start_time < week_end + timedelta(days=1),
-            (TimeEntry.end_time == None) | (TimeEntry.end_time >= week_start),
-        )
-        entries = db.session.execute(q).scalars().all()
-        per_day = []
-        week_total = 0
-        for i in range((week_end - week_start).days + 1):
-            d = week_start + timedelta(days=i)
-            d_iso = d.isoformat()
-            day_start = datetime(d.year, d.month, d.day)
-            day_end = day_start + timedelta(days=1)
-            if d_iso in adjustments:
-                minutes = adjustments[d_iso].total_minutes
-                source = 'justert'
-            else:
-                minutes = 0
-                for e in entries:
-                    s = e.start_time
-                    en = e.end_time or datetime.utcnow()
-                    if s < day_start:
-                        s = day_start
-                    if en > day_end:
-                        en = day_end
-                    delta = en - s
-                    minutes += int(delta.total_seconds() // 60)
-                source = 'automatisk'
-            hours = minutes // 60
-            mins = minutes % 60
-            per_day.append({'date': d_iso, 'weekday': d.strftime('%A'), 'hours': hours, 'minutes': mins, 'total_minutes': minutes, 'source': source})
-            week_total += minutes
-        hh = week_total // 60
-        mm = week_total % 60
-        week_total_fmt = f"{hh:02d}:{mm:02d}"
-        weeks.insert(0, {'week_start': week_start, 'week_end': week_end, 'per_day': per_day, 'week_total': week_total_fmt})
+    if range_start <= range_end:
+        # Hele perioden hentes i én spørring per tabell (justeringer og dagstotaler)
+        adjustments = db.session.execute(
+            db.select(DailyAdjustment).where(DailyAdjustment.user_id == user.id, DailyAdjustment.date >= range_start, DailyAdjustment.date <= range_end)
+        ).scalars().all()
+        days = load_totals([user.id], range_start, range_end, adjustments)[user.id]
+
+        # Del dagene opp i uker, nyeste først
+        complete = len(days) - (range_end - newest_end).days
+        if complete < len(days):
+            weeks.append(_week_view(newest_end + timedelta(days=1), range_end, days[complete:]))
+        for i in range(complete, 0, -7):
+            week_days = days[i - 7:i]
+            weeks.append(_week_view(week_days[0].date, week_days[-1].date, week_days))
+
+    older_cursor = (newest_end - timedelta(days=7 * n_weeks)).isoformat() if available > n_weeks else None
+    newer_cursor = None
+    if newest_end < last_sunday:
+        newer_end = newest_end + timedelta(days=7 * per_page)
+        newer_cursor = newer_end.isoformat() if newer_end < last_sunday else ''
 
     # Vis ukene nyeste først
-    return render_template('timelogs_user.html', user=user, weeks=weeks)
+    return render_template('timelogs_user.html', user=user, weeks=weeks, older_cursor=older_cursor, newer_cursor=newer_cursor)
+
+
+# Rows fetched from the database per round-trip while streaming an export
+EXPORT_CHUNK = 1000
+
+
+def _export_rows(kind, date_from, date_to, user_ids):
+    """Yield (header, row dicts) for the export without loading everything at once."""
+    if kind == 'daily':
+        yield from _export_daily_rows(date_from, date_to, user_ids)
+        return
+
+    q = db.select(TimeEntry.id, TimeEntry.user_id, User.email, TimeEntry.start_time, TimeEntry.end_time).join(
+        User, User.id == TimeEntry.user_id
+    ).order_by(TimeEntry.user_id, TimeEntry.start_time)
+    if date_from:
+        q = q.where((TimeEntry.end_time == None) | (TimeEntry.end_time >= datetime(date_from.year, date_from.month, date_from.day)))
+    if date_to:
+        q = q.where(TimeEntry.start_time < datetime(date_to.year, date_to.month, date_to.day) + timedelta(days=1))
+    if user_ids:
+        q = q.where(TimeEntry.user_id.in_(user_ids))
+    for r in db.session.execute(q.execution_options(yield_per=EXPORT_CHUNK)):
+        yield {
+            'id': r.id,
+            'user_id': r.user_id,
+            'email': r.email,
+            'start_time': r.start_time.isoformat(),
+            'end_time': r.end_time.isoformat() if r.end_time else None,
+            'seconds': int((r.end_time - r.start_time).total_seconds()) if r.end_time else None,
+        }
+
+
+# Users whose daily totals are loaded per query in the daily export
+EXPORT_USER_BATCH = 100
+
+
+def _export_daily_rows(date_from, date_to, user_ids):
+    """Per-day totals as /timelogs shows them: rollup, running time and DailyAdjustment overrides.
+
+    Days without time or adjustment are left out. Missing from/to default to
+    the oldest and newest day with data.
+    """
+    now = datetime.utcnow()
+    if date_from is None:
+        oldest = [
+            db.session.scalar(db.select(db.func.min(DailyTotal.date))),
+            db.session.scalar(db.select(db.func.min(DailyAdjustment.date))),
+        ]
+        running_start = db.session.scalar(db.select(db.func.min(TimeEntry.start_time)).where(TimeEntry.end_time == None))
+        if running_start:
+            oldest.append(running_start.date())
+        oldest = [d for d in oldest if d]
+        if not oldest:
+            return
+        date_from = min(oldest)
+    if date_to is None:
+        newest = [
+            now.date(),
+            db.session.scalar(db.select(db.func.max(DailyTotal.date))),
+            db.session.scalar(db.select(db.func.max(DailyAdjustment.date))),
+        ]
+        date_to = max(d for d in newest if d)
+
+    users_q = db.select(User.id, User.email).order_by(User.id)
+    if user_ids:
+        users_q = users_q.where(User.id.in_(user_ids))
+    users = db.session.execute(users_q).all()
+    for i in range(0, len(users), EXPORT_USER_BATCH):
+        batch = users[i:i + EXPORT_USER_BATCH]
+        ids = [u.id for u in batch]
+        adjustments = db.session.execute(
+            db.select(DailyAdjustment.user_id, DailyAdjustment.date, DailyAdjustment.total_minutes).where(
+                DailyAdjustment.user_id.in_(ids),
+                DailyAdjustment.date >= date_from,
+                DailyAdjustment.date <= date_to,
+            )
+        ).all()
+        totals = load_totals(ids, date_from, date_to, adjustments, now=now)
+        for u in batch:
+            for d in totals[u.id]:
+                if d.seconds or d.adjusted:
+                    yield {'user_id': u.id, 'email': u.email, 'date': d.date.isoformat(),
+                           'seconds': d.seconds, 'adjusted': d.adjusted}
+
+
+EXPORT_FIELDS = {
+    'entries': ['id', 'user_id', 'email', 'start_time', 'end_time', 'seconds'],
+    'daily': ['user_id', 'email', 'date', 'seconds', 'adjusted'],
+}
+
+
+@auth_bp.route('/timelogs/export')
+@login_required
+def timelogs_export():
+    """Stream time entries (or daily totals) as CSV or NDJSON.
+
+    Query args: format=csv|ndjson, rows=entries|daily, from/to (YYYY-MM-DD),
+    user_id (repeatable). Rows are written as they are read from the
+    database, so the full history never has to fit in memory. Daily rows
+    match /timelogs: running time is included and adjusted days show the
+    DailyAdjustment total.
+    """
+    if not current_user.is_editor():
+        flash('Insufficient permissions.', 'danger')
+        return redirect(url_for('index'))
+
+    fmt = request.args.get('format', 'csv')
+    kind = request.args.get('rows', 'entries')
+    if fmt not in ('csv', 'ndjson') or kind not in EXPORT_FIELDS:
+        return {'error': 'Unsupported format or rows'}, 400
+    try:
+        date_from = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else None
+        date_to = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else None
+        user_ids = [int(u) for u in request.args.getlist('user_id')]
+    except ValueError:
+        return {'error': 'Invalid date or user_id'}, 400
+
+    fields = EXPORT_FIELDS[kind]
+    rows = _export_rows(kind, date_from, date_to, user_ids)
+
+    def generate_csv():
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=fields)
+        writer.writeheader()
+        for i, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if i % EXPORT_CHUNK == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+
+    def generate_ndjson():
+        chunk = []
+        for row in rows:
+            chunk.append(json.dumps(row))
+            if len(chunk) >= EXPORT_CHUNK:
+                yield '\n'.join(chunk) + '\n'
+                chunk = []
+        if chunk:
+            yield '\n'.join(chunk) + '\n'
+
+    stamp = datetime.utcnow().strftime('%Y%m%d')
+    if fmt == 'csv':
+        body, mimetype = generate_csv(), 'text/csv'
+    else:
+        body, mimetype = generate_ndjson(), 'application/x-ndjson'
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=timelogs_{kind}_{stamp}.{fmt}'},
+    )
+
+
+def _resolve_rfid(rfid, fresh=False):
+    """Return the RfidUser for a card id, from cache or database (None if unknown).
+
+    fresh: skip the cache and reload from the database (refreshing the cache).
+    """
+    cached = None if fresh else rfid_cache.get(rfid)
+    if cached is not None:
+        return cached
+    user = db.session.execute(db.select(User).where(User.rfid == rfid)).scalar_one_or_none()
+    if not user:
+        return None
+    running = db.session.execute(
+        db.select(TimeEntry.id, TimeEntry.start_time).where(TimeEntry.user_id == user.id, TimeEntry.end_time == None)
+    ).first()
+    item = RfidUser(
+        user.id, user.email, user.alias,
+        running.id if running else None,
+        running.start_time if running else None,
+    )
+    rfid_cache.put(rfid, item)
+    return item
+
+
+def _start_running(rfid, user, at=None, scan_id=None):
+    """Open a TimeEntry for a resolved RFID user. Returns False if one is already running.
+
+    at: start time (UTC) to record instead of now, for buffered scans.
+    scan_id: listener scan id, recorded in the same commit (see ProcessedScan).
+    """
+    entry = TimeEntry(user_id=user.user_id, start_time=at or datetime.utcnow())
+    db.session.add(entry)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # uq_time_entry_running: another scan or process started a timer first
+        db.session.rollback()
+        rfid_cache.invalidate_user(user.user_id)
+        return False
+    started = user._replace(running_id=entry.id, running_start=entry.start_time)
+    if scan_id:
+        db.session.add(ProcessedScan(scan_id=scan_id, user_id=user.user_id))
+    db.session.commit()
+    rfid_cache.put(rfid, started)
+    _publish_timer('started', user.user_id, user.alias or user.email, started.running_start)
+    return True
+
+
+def _stop_running(rfid, user, at=None, scan_id=None):
+    """Close the running TimeEntry for a resolved RFID user.
+
+    at: end time (UTC) to record instead of now, for buffered scans.
+    scan_id: listener scan id, recorded in the same commit (see ProcessedScan).
+    Returns the duration in seconds, or None if no timer is running.
+    """
+    # The guarded UPDATE catches a cached entry that was stopped elsewhere
+    end_time = at or datetime.utcnow()
+    for _ in range(2):
+        if not user.running_id:
+            return None
+        result = db.session.execute(
+            db.update(TimeEntry)
+            .where(TimeEntry.id == user.running_id, TimeEntry.end_time == None)
+            .values(end_time=end_time)
+        )
+        if result.rowcount == 1:
+            break
+        db.session.rollback()
+        rfid_cache.invalidate_user(user.user_id)
+        user = _resolve_rfid(rfid)
+        if not user:
+            return None
+    else:
+        return None
+
+    record_entry(Span(user.user_id, user.running_start, end_time))
+    if scan_id:
+        db.session.add(ProcessedScan(scan_id=scan_id, user_id=user.user_id))
+    db.session.commit()
+    rfid_cache.put(rfid, user._replace(running_id=None, running_start=None))
+    _publish_timer('stopped', user.user_id, user.alias or user.email, end_time, user.running_start)
+    return int((end_time - user.running_start).total_seconds())
 
 
 @auth_bp.route('/time/start_by_rfid', methods=['POST'])
+@device_auth
 def start_time_by_rfid():
     """Start timer for user via RFID card scan (from Arduino listener)."""
     data = request.json
@@ -551,26 +967,25 @@ def start_time_by_rfid():
     if not rfid:
         return {'error': 'No RFID provided'}, 400
     
-    # Find user by RFID
-    user = db.session.execute(db.select(User).where(User.rfid == rfid)).scalar_one_or_none()
+    # Find user by RFID (cached)
+    user = _resolve_rfid(rfid)
     if not user:
         return {'error': 'User not found for RFID'}, 404
     
-    # Check if already running
-    running = db.session.execute(
-        db.select(TimeEntry).where(TimeEntry.user_id == user.id, TimeEntry.end_time == None)
-    ).scalar_one_or_none()
-    if running:
+    if user.running_id:
+        # The cache may predate a stop in another worker or on the web: check the database
+        user = _resolve_rfid(rfid, fresh=True)
+        if not user:
+            return {'error': 'User not found for RFID'}, 404
+
+    # Start timer unless already running
+    if user.running_id or not _start_running(rfid, user):
         return {'error': 'Timer already running for user'}, 409
-    
-    # Start timer
-    entry = TimeEntry(user_id=user.id)
-    db.session.add(entry)
-    db.session.commit()
     return {'status': 'ok', 'user': user.email, 'message': f'Timer started for {user.alias or user.email}'}
 
 
 @auth_bp.route('/time/stop_by_rfid', methods=['POST'])
+@device_auth
 def stop_time_by_rfid():
     """Stop timer for user via RFID card scan (from Arduino listener)."""
     data = request.json
@@ -579,21 +994,196 @@ def stop_time_by_rfid():
     if not rfid:
         return {'error': 'No RFID provided'}, 400
     
-    # Find user by RFID
-    user = db.session.execute(db.select(User).where(User.rfid == rfid)).scalar_one_or_none()
+    # Find user and running entry by RFID (cached)
+    user = _resolve_rfid(rfid)
     if not user:
         return {'error': 'User not found for RFID'}, 404
     
-    # Find running entry
-    running = db.session.execute(
-        db.select(TimeEntry).where(TimeEntry.user_id == user.id, TimeEntry.end_time == None)
-    ).scalar_one_or_none()
-    if not running:
+    duration = _stop_running(rfid, user)
+    if duration is None:
+        # The cache may have missed a start in another worker
+        user = _resolve_rfid(rfid, fresh=True)
+        duration = _stop_running(rfid, user) if user else None
+    if duration is None:
         return {'error': 'No running timer for user'}, 404
-    
-    # Stop timer
-    running.end_time = datetime.utcnow()
-    running.duration_seconds = int((running.end_time - running.start_time).total_seconds())
-    db.session.commit()
-    return {'status': 'ok', 'user': user.email, 'duration': running.duration_seconds}
+    return {'status': 'ok', 'user': user.email, 'duration': duration}
+
+
+@auth_bp.route('/time/toggle_by_rfid', methods=['POST'])
+@device_auth
+def toggle_time_by_rfid():
+    """Start or stop the timer for an RFID card in a single request.
+
+    The decision is made server-side; the unique index on running entries
+    guarantees at most one open entry per user even if scanners race.
+    """
+    data = request.json
+    rfid = data.get('rfid', '').strip()
+
+    if not rfid:
+        return {'error': 'No RFID provided'}, 400
+
+    user = _resolve_rfid(rfid)
+    if not user:
+        return {'error': 'User not found for RFID'}, 404
+
+    duration = _stop_running(rfid, user)
+    if duration is None:
+        if _start_running(rfid, user._replace(running_id=None, running_start=None)):
+            return {'status': 'ok', 'action': 'started', 'user': user.email,
+                    'message': f'Timer started for {user.alias or user.email}'}
+        # A timer the cache did not know about (started in another worker): stop that one instead
+        user = _resolve_rfid(rfid, fresh=True)
+        duration = _stop_running(rfid, user) if user else None
+        if duration is None:
+            return {'error': 'Timer already running for user'}, 409
+    return {'status': 'ok', 'action': 'stopped', 'user': user.email, 'duration': duration,
+            'message': f'Timer stopped for {user.alias or user.email}'}
+
+
+# Upper bound on events accepted in one /time/scan_batch request
+MAX_SCAN_BATCH = 500
 
+
+def _parse_scan_time(value):
+    """Parse an ISO 8601 scan timestamp into a naive UTC datetime."""
+    ts = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _apply_scan(rfid, ts, action, scan_id=None):
+    """Apply one buffered scan at its original timestamp and return a result dict.
+
+    scan_id: the listener's id for the scan; a scan whose id was already
+    applied is reported as a duplicate.
+    """
+    user = _resolve_rfid(rfid)
+    if not user:
+        return {'status': 'error', 'error': 'User not found for RFID'}
+
+    if scan_id:
+        applied = db.session.get(ProcessedScan, scan_id)
+    else:
+        # Clients without scan ids: a scan already stored with this exact timestamp is a duplicate
+        applied = db.session.execute(
+            db.select(TimeEntry.id).where(
+                TimeEntry.user_id == user.user_id,
+                (TimeEntry.start_time == ts) | (TimeEntry.end_time == ts),
+            ).limit(1)
+        ).first()
+    if applied:
+        return {'status': 'duplicate', 'user': user.email}
+
+    def stop(user):
+        if ts < user.running_start:
+            return {'status': 'error', 'error': 'Scan is older than the running timer'}
+        duration = _stop_running(rfid, user, at=ts, scan_id=scan_id)
+        if duration is not None:
+            return {'status': 'ok', 'action': 'stopped', 'user': user.email, 'duration': duration}
+        return None
+
+    if action == 'stop' and not user.running_id:
+        # The cache may have missed a start in another worker
+        user = _resolve_rfid(rfid, fresh=True)
+    if action in ('toggle', 'stop') and user.running_id:
+        result = stop(user)
+        if result:
+            return result
+    if action == 'stop':
+        return {'status': 'error', 'error': 'No running timer for user'}
+    # A late spooled scan must not open an entry overlapping one that was closed after it
+    later = db.session.execute(
+        db.select(TimeEntry.id).where(TimeEntry.user_id == user.user_id, TimeEntry.end_time > ts).limit(1)
+    ).first()
+    if later:
+        return {'status': 'error', 'error': 'Scan is older than the last recorded entry'}
+    if _start_running(rfid, user._replace(running_id=None, running_start=None), at=ts, scan_id=scan_id):
+        return {'status': 'ok', 'action': 'started', 'user': user.email}
+    if action == 'toggle':
+        # A timer the cache did not know about is open: this scan stops it
+        user = _resolve_rfid(rfid, fresh=True)
+        result = stop(user) if user and user.running_id else None
+        if result:
+            return result
+    return {'status': 'error', 'error': 'Timer already running for user'}
+
+
+@auth_bp.route('/time/scan_batch', methods=['POST'])
+@device_auth
+def scan_batch():
+    """Apply many timestamped RFID scans in one request (buffered listener).
+
+    Body: {"events": [{"rfid": ..., "ts": ISO 8601 UTC, "action": "toggle"|"start"|"stop"}, ...]}
+    Events are applied in timestamp order using the scanner's time, so scans
+    spooled while the server was down land where they happened. Results are
+    returned in request order.
+    """
+    data = request.get_json(silent=True) or {}
+    events = data.get('events')
+    if not isinstance(events, list) or not events:
+        return {'error': 'No events provided'}, 400
+    if len(events) > MAX_SCAN_BATCH:
+        return {'error': f'At most {MAX_SCAN_BATCH} events per batch'}, 413
+
+    latest = datetime.utcnow() + timedelta(minutes=1)
+    results = [None] * len(events)
+    parsed = []
+    for i, ev in enumerate(events):
+        try:
+            rfid = str(ev.get('rfid', '')).strip()
+            ts = _parse_scan_time(ev['ts'])
+            action = ev.get('action', 'toggle')
+            scan_id = str(ev['id'])[:64] if ev.get('id') else None
+        except (AttributeError, KeyError, TypeError, ValueError):
+            results[i] = {'status': 'error', 'error': 'Invalid event'}
+            continue
+        if not rfid or action not in ('toggle', 'start', 'stop'):
+            results[i] = {'status': 'error', 'error': 'Invalid event'}
+        elif ts > latest:
+            results[i] = {'status': 'error', 'error': 'Timestamp is in the future'}
+        else:
+            parsed.append((ts, i, rfid, action, scan_id))
+
+    ids_ready = _processed_scan_ready()
+    if not ids_ready and any(p[4] for p in parsed):
+        # Without the table scan ids can't be recorded, and the listener must keep these scans
+        return {'error': 'Database not upgraded: processed_scan table is missing (run python upgrade_db.py)'}, 409
+
+    for ts, i, rfid, action, scan_id in sorted(parsed):
+        results[i] = _apply_scan(rfid, ts, action, scan_id)
+    for ev, result in zip(events, results):
+        if isinstance(ev, dict) and 'id' in ev:
+            result['id'] = ev['id']
+    if ids_ready:
+        _prune_processed_scans()
+    return {'status': 'ok', 'results': results}
+
+
+# Set once this process has seen the processed_scan table (created by schema.upgrade())
+_processed_scan_exists = False
+
+
+def _processed_scan_ready():
+    """True if the processed_scan table exists; re-checked on each call until it does."""
+    global _processed_scan_exists
+    if not _processed_scan_exists:
+        _processed_scan_exists = inspect(db.engine).has_table(ProcessedScan.__tablename__)
+    return _processed_scan_exists
+
+
+# Monotonic time of this process's last ProcessedScan cleanup
+_last_scan_prune = 0.0
+
+
+def _prune_processed_scans():
+    """Delete scan ids older than SCAN_ID_RETENTION_DAYS, at most once an hour per process."""
+    global _last_scan_prune
+    now = time.monotonic()
+    if _last_scan_prune and now - _last_scan_prune < 3600:
+        return
+    _last_scan_prune = now
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config.get('SCAN_ID_RETENTION_DAYS', 30))
+    db.session.execute(db.delete(ProcessedScan).where(ProcessedScan.created_at < cutoff))
+    db.session.commit()
@@ -0,0 +1,60 @@
+"""Engine settings per database backend.
+
+SQLite gets WAL journaling (readers no longer wait for a writer), a busy
+timeout so concurrent scans queue instead of failing with "database is
+locked", and larger page cache / mmap. Server databases get an explicit
+connection pool with pre-ping and recycling, so connections dropped by the
+server or a proxy are replaced instead of failing a request.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from .models import db
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database URL.
+
+    Options already set in SQLALCHEMY_ENGINE_OPTIONS take precedence.
+    """
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    if url.get_backend_name() == "sqlite":
+        options = {"connect_args": {"timeout": config.get("SQLITE_BUSY_TIMEOUT_MS", 5000) / 1000}}
+    else:
+        options = {
+            "pool_size": config.get("DB_POOL_SIZE", 5),
+            "max_overflow": config.get("DB_MAX_OVERFLOW", 10),
+            "pool_timeout": config.get("DB_POOL_TIMEOUT", 10),
+            "pool_recycle": config.get("DB_POOL_RECYCLE", 1800),
+            "pool_pre_ping": config.get("DB_POOL_PRE_PING", True),
+        }
+    options.update(config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    return options
+
+
+def sqlite_pragmas(config):
+    """(name, value) pairs to run on each new SQLite connection."""
+    pragmas = [
+        ("journal_mode", config.get("SQLITE_JOURNAL_MODE")),
+        ("synchronous", config.get("SQLITE_SYNCHRONOUS")),
+        ("busy_timeout", config.get("SQLITE_BUSY_TIMEOUT_MS")),
+        ("mmap_size", config.get("SQLITE_MMAP_SIZE")),
+        ("cache_size", config.get("SQLITE_CACHE_SIZE")),
+    ]
+    return [(name, value) for name, value in pragmas if value not in (None, "")]
+
+
+def install_sqlite_pragmas(app):
+    """Run the SQLite pragmas on every connection the app's engine opens."""
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = sqlite_pragmas(app.config)
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
@@ -0,0 +1,152 @@
+"""Signed, revocable device tokens for kiosks and RFID listeners.
+
+A token is a random secret signed with the app's SECRET_KEY. Forged or
+mangled tokens fail the signature check without touching the database;
+valid ones are looked up by the SHA-256 of the secret (unique index), so no
+password hashing and no character-by-character secret comparison is
+involved. Verified tokens are cached in-process for ``DEVICE_TOKEN_CACHE_TTL``
+seconds; revoking drops them here at once and in other workers within the TTL.
+
+Clients send ``Authorization: Bearer <token>`` (or ``X-Device-Token``).
+"""
+from collections import namedtuple
+from datetime import datetime
+from functools import wraps
+import hashlib
+import secrets
+import threading
+import time
+
+from flask import g, request, session
+from itsdangerous import BadSignature, Signer
+
+from .models import db, DeviceToken
+
+DeviceIdentity = namedtuple("DeviceIdentity", "id name user_id")
+
+
+def _digest(secret):
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+
+class DeviceTokens:
+    def __init__(self, cache_ttl=60.0):
+        self.cache_ttl = cache_ttl
+        self.required = False
+        self._signer = None
+        self._by_digest = {}  # digest -> (expires, DeviceIdentity)
+        self._active = {}  # token id -> (expires, bool), for kiosk sessions
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.cache_ttl = app.config.get("DEVICE_TOKEN_CACHE_TTL", self.cache_ttl)
+        self.required = app.config.get("DEVICE_TOKEN_REQUIRED", False)
+        self._signer = Signer(app.secret_key, salt="device-token")
+        self.clear()
+
+    # --- issuing and revoking -------------------------------------------
+
+    def issue(self, name, user_id=None):
+        """Create a token and commit. Returns (DeviceToken, token string); show the string once."""
+        secret = secrets.token_urlsafe(32)
+        row = DeviceToken(name=name, token_hash=_digest(secret), user_id=user_id)
+        db.session.add(row)
+        db.session.commit()
+        return row, self._signer.sign(secret).decode()
+
+    def revoke(self, token_id):
+        """Revoke a token and commit. Returns False if it does not exist or was already revoked."""
+        row = db.session.get(DeviceToken, token_id)
+        if row is None or row.revoked_at is not None:
+            return False
+        row.revoked_at = datetime.utcnow()
+        db.session.commit()
+        with self._lock:
+            self._by_digest = {d: hit for d, hit in self._by_digest.items() if hit[1].id != token_id}
+            self._active.pop(token_id, None)
+        return True
+
+    # --- verification ---------------------------------------------------
+
+    def verify(self, token):
+        """Return the DeviceIdentity for a valid, unrevoked token, else None."""
+        if not token:
+            return None
+        try:
+            secret = self._signer.unsign(token).decode()
+        except BadSignature:
+            return None
+        digest = _digest(secret)
+        now = time.monotonic()
+        with self._lock:
+            hit = self._by_digest.get(digest)
+        if hit is not None and hit[0] > now:
+            return hit[1]
+
+        row = db.session.execute(
+            db.select(DeviceToken).where(DeviceToken.token_hash == digest, DeviceToken.revoked_at == None)
+        ).scalar_one_or_none()
+        if row is None:
+            return None
+        identity = DeviceIdentity(row.id, row.name, row.user_id)
+        # Recorded on cache refresh only, not on every scan
+        row.last_used_at = datetime.utcnow()
+        db.session.commit()
+        with self._lock:
+            self._by_digest[digest] = (now + self.cache_ttl, identity)
+        return identity
+
+    def is_active(self, token_id):
+        """True while a token is not revoked (cached), for sessions opened with it."""
+        now = time.monotonic()
+        with self._lock:
+            hit = self._active.get(token_id)
+        if hit is not None and hit[0] > now:
+            return hit[1]
+        active = db.session.execute(
+            db.select(DeviceToken.id).where(DeviceToken.id == token_id, DeviceToken.revoked_at == None)
+        ).first() is not None
+        with self._lock:
+            self._active[token_id] = (now + self.cache_ttl, active)
+        return active
+
+    def token_from_request(self):
+        auth = request.headers.get("Authorization", "")
+        if auth.startswith("Bearer "):
+            return auth[7:].strip()
+        return request.headers.get("X-Device-Token") or None
+
+    def clear(self):
+        with self._lock:
+            self._by_digest.clear()
+            self._active.clear()
+
+
+device_tokens = DeviceTokens()
+
+
+def device_auth(view):
+    """Accept a device token on machine endpoints (the RFID scan API).
+
+    A token that is sent must be valid; without one the request is allowed
+    unless DEVICE_TOKEN_REQUIRED is set. The identity is left in g.device.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = device_tokens.token_from_request()
+        g.device = device_tokens.verify(token) if token else None
+        if token and g.device is None:
+            return {'error': 'Invalid or revoked device token'}, 401
+        if g.device is None and device_tokens.required:
+            return {'error': 'Device token required'}, 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def check_device_session():
+    """before_request hook: end kiosk sessions whose device token was revoked."""
+    token_id = session.get("device_token_id")
+    if token_id is not None and not device_tokens.is_active(token_id):
+        from flask_login import logout_user
+        logout_user()
+        session.pop("device_token_id", None)
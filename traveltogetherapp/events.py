@@ -0,0 +1,56 @@
+"""In-process publish/subscribe for timer start/stop events.
+
+Every start or stop publishes a small event; each open /time/stream
+connection has its own bounded queue. Events only reach subscribers in the
+same process, so the stream also re-sends a snapshot periodically to pick up
+changes made by other workers.
+
+Each open stream holds a server thread, so a process serves at most
+``SSE_MAX_STREAMS`` of them; subscribe() yields None beyond that.
+"""
+from contextlib import contextmanager
+import queue
+import threading
+
+
+class EventBus:
+    def __init__(self, max_queue=100, max_subscribers=0):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers  # 0 = unlimited
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_subscribers = app.config.get("SSE_MAX_STREAMS", self.max_subscribers)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # Slow client; it will catch up with the next snapshot
+                pass
+
+    @contextmanager
+    def subscribe(self):
+        """Yield a queue of events, or None if max_subscribers are already open."""
+        q = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            if self.max_subscribers and len(self._subscribers) >= self.max_subscribers:
+                q = None
+            else:
+                self._subscribers.add(q)
+        try:
+            yield q
+        finally:
+            if q is not None:
+                with self._lock:
+                    self._subscribers.discard(q)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+timer_events = EventBus()
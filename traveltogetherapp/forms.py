@@ -1,4 +1,4 @@
-from wtforms import Form, StringField, PasswordField, TextAreaField, validators
+from wtforms import Form, StringField, PasswordField, TextAreaField, BooleanField, validators
 
 
 class RegisterForm(Form):
@@ -15,6 +15,7 @@ class RegisterForm(Form):
 class LoginForm(Form):
     email = StringField("Email", [validators.DataRequired(), validators.Email()])
     password = PasswordField("Password", [validators.DataRequired()])
+    remember = BooleanField("Remember me")
 
 
 class ProfileForm(Form):
@@ -0,0 +1,256 @@
+"""Opt-in request instrumentation with a Prometheus ``/metrics`` endpoint.
+
+Enabled with ``METRICS_ENABLED``. Per endpoint it records request latency,
+the number and time of SQL queries (SQLAlchemy engine events) and template
+render time, as Prometheus histograms. Requests to the endpoints in
+``PROFILE_ENDPOINTS`` are stack-sampled while they run; when one takes longer
+than ``SLOW_REQUEST_MS`` the samples are written to ``PROFILE_DIR`` in the
+collapsed-stack format read by flamegraph.pl and speedscope.
+
+Values are kept per process: with several gunicorn workers each scrape sees
+the worker that answered it (the ``pid`` label tells them apart).
+
+Latency is measured until the response is returned to the server, so for
+streamed responses (SSE, exports) it excludes the streaming itself.
+
+``/metrics`` requires ``Authorization: Bearer <METRICS_TOKEN>``. Without a
+token configured it is only served in debug mode (404 otherwise).
+"""
+from collections import Counter
+import hmac
+import os
+import sys
+import threading
+import time
+
+from flask import g, has_request_context, request, Response, abort, current_app, template_rendered, before_render_template
+from sqlalchemy import event
+
+from .models import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._counts = {}
+        self._sums = Counter()
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            counts = self._counts.get(label_values)
+            if counts is None:
+                counts = self._counts[label_values] = [0] * (len(self.buckets) + 1)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            self._sums[label_values] += value
+
+    def render(self, extra):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, counts in sorted(self._counts.items()):
+                labels = _labels(self.labels, label_values, extra)
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {counts[-1]}')
+                lines.append(f"{self.name}_sum{{{labels}}} {self._sums[label_values]:.6f}")
+                lines.append(f"{self.name}_count{{{labels}}} {counts[-1]}")
+        return lines
+
+
+def _labels(names, values, extra):
+    pairs = list(zip(names, values)) + list(extra)
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class StackSampler:
+    """Samples the stacks of registered threads from one background thread."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._targets = {}  # thread id -> Counter of collapsed stacks
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, thread_id):
+        samples = Counter()
+        with self._lock:
+            self._targets[thread_id] = samples
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name='stack-sampler')
+                self._thread.start()
+        return samples
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._targets.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._targets:
+                    self._thread = None
+                    return
+                targets = dict(self._targets)
+            frames = sys._current_frames()
+            for thread_id, samples in targets.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    samples[_collapse(frame)] += 1
+            time.sleep(self.interval)
+
+
+def _collapse(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class Instrumentation:
+    def __init__(self):
+        self.enabled = False
+        self.request_latency = Histogram(
+            "http_request_duration_seconds", "Time to build the response per endpoint.",
+            ("endpoint", "method", "status"), LATENCY_BUCKETS)
+        self.request_queries = Histogram(
+            "db_queries_per_request", "SQL statements executed per request.",
+            ("endpoint",), QUERY_COUNT_BUCKETS)
+        self.request_db_time = Histogram(
+            "db_query_duration_seconds", "Total SQL time per request.",
+            ("endpoint",), LATENCY_BUCKETS)
+        self.template_time = Histogram(
+            "template_render_duration_seconds", "Jinja render time per template.",
+            ("template",), LATENCY_BUCKETS)
+        self.sampler = StackSampler()
+        self.slow_ms = 0
+        self.profile_endpoints = frozenset()
+        self.profile_dir = None
+        self.token = None
+
+    def init_app(self, app):
+        self.enabled = app.config.get("METRICS_ENABLED", False)
+        if not self.enabled:
+            return
+        self.slow_ms = app.config.get("SLOW_REQUEST_MS", 500)
+        self.profile_endpoints = frozenset(app.config.get("PROFILE_ENDPOINTS") or ())
+        self.profile_dir = app.config.get("PROFILE_DIR") or os.path.join(app.instance_path, "profiles")
+        self.sampler.interval = app.config.get("PROFILE_INTERVAL_MS", 5) / 1000
+        self.token = app.config.get("METRICS_TOKEN")
+        if not self.token:
+            app.logger.warning("METRICS_ENABLED without METRICS_TOKEN: /metrics is only served in debug mode")
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", self._before_cursor)
+        event.listen(engine, "after_cursor_execute", self._after_cursor)
+        event.listen(engine, "handle_error", self._cursor_error)
+        app.add_url_rule("/metrics", "metrics", self.metrics_view)
+
+    # --- request timing -------------------------------------------------
+
+    def _before_request(self):
+        g._metrics = {"start": time.perf_counter(), "queries": 0, "db_time": 0.0, "renders": []}
+        if request.endpoint in self.profile_endpoints:
+            g._metrics["samples"] = self.sampler.start(threading.get_ident())
+
+    def _after_request(self, response):
+        m = g.get("_metrics")
+        if m is None:
+            return response
+        elapsed = time.perf_counter() - m["start"]
+        endpoint = request.endpoint or "unmatched"
+        self.request_latency.observe((endpoint, request.method, response.status_code), elapsed)
+        self.request_queries.observe((endpoint,), m["queries"])
+        self.request_db_time.observe((endpoint,), m["db_time"])
+        m["recorded"] = elapsed
+        return response
+
+    def _teardown_request(self, exc):
+        m = g.pop("_metrics", None)
+        if m is None or "samples" not in m:
+            return
+        samples = self.sampler.stop(threading.get_ident())
+        elapsed = m.get("recorded", time.perf_counter() - m["start"])
+        if samples and self.slow_ms and elapsed * 1000 >= self.slow_ms:
+            self._dump_profile(request.endpoint, elapsed, m, samples)
+
+    def _dump_profile(self, endpoint, elapsed, m, samples):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        path = os.path.join(self.profile_dir, f"{endpoint}-{stamp}-{int(elapsed * 1000)}ms.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"# {request.method} {request.full_path} {elapsed * 1000:.0f} ms, "
+                    f"{m['queries']} queries ({m['db_time'] * 1000:.0f} ms SQL)\n")
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+    # --- SQL and templates ----------------------------------------------
+
+    def _before_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metrics_start", []).append(time.perf_counter())
+
+    def _after_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["_metrics_start"].pop()
+        if has_request_context():
+            m = g.get("_metrics")
+            if m is not None:
+                m["queries"] += 1
+                m["db_time"] += time.perf_counter() - started
+
+    def _cursor_error(self, context):
+        starts = context.connection.info.get("_metrics_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    def _before_render(self, sender, template, context, **extra):
+        m = g.get("_metrics")
+        if m is not None:
+            m["renders"].append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        m = g.get("_metrics")
+        if m is not None and m["renders"]:
+            self.template_time.observe((template.name,), time.perf_counter() - m["renders"].pop())
+
+    # --- exposition -----------------------------------------------------
+
+    def render(self):
+        extra = (("pid", os.getpid()),)
+        lines = []
+        for histogram in (self.request_latency, self.request_queries, self.request_db_time, self.template_time):
+            lines.extend(histogram.render(extra))
+        return "\n".join(lines) + "\n"
+
+    def metrics_view(self):
+        if not self.token:
+            # Endpoint names and latencies are not for the public internet
+            if not current_app.debug:
+                abort(404)
+        elif not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {self.token}"):
+            abort(401)
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+
+instrumentation = Instrumentation()
@@ -4,6 +4,17 @@ from datetime import datetime
 
 db = SQLAlchemy()
 
+
+def session_id(user_id, session_version):
+    """Login id kept in the session and the remember-me cookie: "<user id>:<session version>".
+
+    session_version is only bumped by a password change, so that signs out
+    every other session and remember-me cookie of the user; a rehash of the
+    same password on login does not.
+    """
+    return f"{user_id}:{session_version or 0}"
+
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(100), unique=True, nullable=False)
@@ -15,6 +26,14 @@ class User(UserMixin, db.Model):
     role = db.Column(db.String(20), nullable=False, default='user')
     # RFID card ID for time logging via scanner
     rfid = db.Column(db.String(100), nullable=True)
+    # Bumped when the password changes; part of the login id (see session_id)
+    session_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Every RFID scan looks the user up by card id
+    __table_args__ = (db.Index('ix_user_rfid', 'rfid', unique=True),)
+
+    def get_id(self):
+        return session_id(self.id, self.session_version)
 
     def is_editor(self):
         return (self.role or 'user') in ('editor', 'admin')
@@ -38,6 +57,18 @@ class TimeEntry(db.Model):
 
     user = db.relationship("User", backref="time_entries", lazy=True)
 
+    __table_args__ = (
+        # Range queries in the reports: user_id = ? AND start_time < ?
+        db.Index('ix_time_entry_user_start', 'user_id', 'start_time'),
+        # Running timer lookup: user_id = ? AND end_time IS NULL.
+        # Unique, so the database guarantees at most one open entry per user.
+        db.Index(
+            'uq_time_entry_running', 'user_id', unique=True,
+            sqlite_where=db.text('end_time IS NULL'),
+            postgresql_where=db.text('end_time IS NULL'),
+        ),
+    )
+
 
 # Ny modell for manuell dagsjustering (uten sekunder)
 class DailyAdjustment(db.Model):
@@ -49,3 +80,45 @@ class DailyAdjustment(db.Model):
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
     __table_args__ = (db.UniqueConstraint('user_id', 'date', name='_user_date_uc'),)
+
+
+# Forhåndsberegnet sum per bruker og dag (vedlikeholdes når en timer stoppes)
+class DailyTotal(db.Model):
+    """Materialized per-day rollup of closed TimeEntry rows.
+
+    seconds: sum of closed entry time falling on ``date`` (UTC). Running
+    entries are not included and must be added live by the reader.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    seconds = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'date', name='_daily_total_user_date_uc'),)
+
+
+# Skann fra /time/scan_batch som allerede er brukt (for å oppdage gjentatte opplastinger)
+class ProcessedScan(db.Model):
+    """Scan id sent by the RFID listener, recorded in the same commit as its start/stop.
+
+    Rows older than SCAN_ID_RETENTION_DAYS are pruned.
+    """
+    scan_id = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+# Langtidsnøkkel for kiosker og RFID-lesere (kun SHA-256 av hemmeligheten lagres)
+class DeviceToken(db.Model):
+    """Revocable credential for a kiosk or RFID listener.
+
+    token_hash: SHA-256 of the token secret; the token itself is only shown once.
+    user_id: user a kiosk acts as (None for scanners, which only post scans).
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    token_hash = db.Column(db.String(64), nullable=False, unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, nullable=True)
+    revoked_at = db.Column(db.DateTime, nullable=True)
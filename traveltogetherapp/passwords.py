@@ -0,0 +1,86 @@
+"""Password hashing with configurable cost, off the request threads.
+
+Hashing and verifying a password is deliberately slow CPU work. It runs in
+a small bounded pool (``PASSWORD_HASH_WORKERS`` threads or processes), so a
+burst of logins can use at most that many cores while the other request
+threads keep serving scans. When more than ``PASSWORD_HASH_MAX_PENDING``
+hashes are waiting, new ones are refused with HasherBusy instead of queuing
+without bound.
+
+The algorithm and cost come from ``PASSWORD_HASH_METHOD`` (any Werkzeug
+method string, e.g. ``scrypt:32768:8:1`` or ``pbkdf2:sha256:600000``). A
+hash made with other parameters is replaced on the next successful login.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import threading
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    """Too many password hashes are already waiting for the pool."""
+
+
+class PasswordHasher:
+    def __init__(self, method="scrypt:32768:8:1", salt_length=16, workers=2, pool="thread", max_pending=32):
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = workers
+        self.pool_kind = pool
+        self.max_pending = max_pending
+        self._pool = None
+        self._pending = None
+        self._method_id = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.method = app.config.get("PASSWORD_HASH_METHOD", self.method)
+        self.salt_length = app.config.get("PASSWORD_SALT_LENGTH", self.salt_length)
+        self.workers = app.config.get("PASSWORD_HASH_WORKERS", self.workers)
+        self.pool_kind = app.config.get("PASSWORD_HASH_POOL", self.pool_kind)
+        self.max_pending = app.config.get("PASSWORD_HASH_MAX_PENDING", self.max_pending)
+        self.shutdown()
+
+    def _executor(self):
+        # Created on first use, i.e. in the worker process after gunicorn forks
+        with self._lock:
+            if self._pool is None:
+                executor = ProcessPoolExecutor if self.pool_kind == "process" else ThreadPoolExecutor
+                self._pool = executor(max_workers=self.workers)
+                self._pending = threading.BoundedSemaphore(self.workers + self.max_pending)
+            return self._pool, self._pending
+
+    def _run(self, fn, *args):
+        pool, pending = self._executor()
+        if not pending.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            return pool.submit(fn, *args).result()
+        finally:
+            pending.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, stored, password):
+        if not stored or "$" not in stored:
+            return False
+        return self._run(check_password_hash, stored, password)
+
+    def needs_rehash(self, stored):
+        """True if ``stored`` was made with another method or cost than configured."""
+        if self._method_id is None:
+            # Werkzeug expands defaults (e.g. "scrypt" -> "scrypt:32768:8:1"); hash once to learn the prefix
+            self._method_id = self.hash("").split("$", 1)[0]
+        return stored.split("$", 1)[0] != self._method_id
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+            self._pool = None
+            self._pending = None
+            self._method_id = None
+
+
+password_hasher = PasswordHasher()
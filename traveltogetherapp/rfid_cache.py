@@ -0,0 +1,54 @@
+"""In-process cache for RFID scan resolution.
+
+Maps an RFID card id to the owning user and that user's running TimeEntry,
+so a badge scan can go straight to the write. Entries are dropped whenever
+the user's RFID, profile, role or timer state changes in this process, and
+expire after ``RFID_CACHE_TTL`` seconds so changes made by another worker
+(or a web start/stop) are picked up. Callers re-check the database before
+refusing a scan based on a cached running timer.
+"""
+from collections import namedtuple
+
+from .ttl_cache import TTLCache
+
+# running_id/running_start: the open TimeEntry, or None when no timer runs
+RfidUser = namedtuple("RfidUser", "user_id email alias running_id running_start")
+
+
+class RfidCache(TTLCache):
+    """Bounded, thread-safe LRU cache of rfid -> RfidUser with a TTL.
+
+    Also indexed by user id, so invalidate_user() finds a user's card and a
+    card re-registered to the same user replaces the old one.
+    """
+
+    def __init__(self, max_size=1024, ttl=30.0):
+        super().__init__(max_size, ttl)
+        self._by_user = {}
+
+    def init_app(self, app):
+        self.max_size = app.config.get("RFID_CACHE_SIZE", self.max_size)
+        self.ttl = app.config.get("RFID_CACHE_TTL", self.ttl)
+        self.clear()
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            rfid = self._by_user.get(user_id)
+            if rfid is not None:
+                self._remove(rfid)
+
+    def _added(self, rfid, item):
+        stale_rfid = self._by_user.get(item.user_id)
+        if stale_rfid is not None:
+            self._remove(stale_rfid)
+        self._by_user[item.user_id] = rfid
+
+    def _removed(self, rfid, item):
+        if self._by_user.get(item.user_id) == rfid:
+            del self._by_user[item.user_id]
+
+    def _cleared(self):
+        self._by_user.clear()
+
+
+rfid_cache = RfidCache()
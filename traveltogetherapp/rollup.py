@@ -0,0 +1,96 @@
+"""Maintenance and reading of the DailyTotal rollup.
+
+Closed TimeEntry rows are folded into DailyTotal when a timer stops, so the
+reports only read one row per user and day and compute the still-running
+entry live.
+"""
+from datetime import datetime, timedelta
+
+from .aggregation import daily_totals, day_start
+from .models import db, TimeEntry, DailyTotal
+
+
+def record_entry(entry):
+    """Add a closed entry's time to the DailyTotal rows of the days it covers.
+
+    Entries crossing midnight are split across days. The caller commits.
+    """
+    if entry.end_time is None:
+        return
+    start = entry.start_time.date()
+    end = entry.end_time.date()
+    days = daily_totals([entry], start, end, user_ids=[entry.user_id])[entry.user_id]
+    existing = {t.date: t for t in db.session.execute(
+        db.select(DailyTotal).where(
+            DailyTotal.user_id == entry.user_id,
+            DailyTotal.date >= start,
+            DailyTotal.date <= end,
+        )
+    ).scalars()}
+    for d in days:
+        if d.seconds <= 0:
+            continue
+        total = existing.get(d.date)
+        if total:
+            total.seconds += d.seconds
+        else:
+            db.session.add(DailyTotal(user_id=entry.user_id, date=d.date, seconds=d.seconds))
+
+
+def rebuild(user_ids=None):
+    """Recompute DailyTotal from all closed TimeEntry rows and commit.
+
+    user_ids limits the rebuild to some users; None rebuilds everything.
+    Returns the number of rollup rows written.
+    """
+    delete_q = db.delete(DailyTotal)
+    entries_q = db.select(TimeEntry.user_id, TimeEntry.start_time, TimeEntry.end_time).where(
+        TimeEntry.end_time != None
+    )
+    if user_ids is not None:
+        delete_q = delete_q.where(DailyTotal.user_id.in_(user_ids))
+        entries_q = entries_q.where(TimeEntry.user_id.in_(user_ids))
+    db.session.execute(delete_q)
+
+    sums = {}
+    for e in db.session.execute(entries_q):
+        start = e.start_time.date()
+        end = e.end_time.date()
+        for d in daily_totals([e], start, end).get(e.user_id, []):
+            if d.seconds > 0:
+                key = (e.user_id, d.date)
+                sums[key] = sums.get(key, 0) + d.seconds
+
+    db.session.add_all(
+        DailyTotal(user_id=uid, date=d, seconds=secs) for (uid, d), secs in sums.items()
+    )
+    db.session.commit()
+    return len(sums)
+
+
+def load_totals(user_ids, start_date, end_date, adjustments=(), now=None, running=None):
+    """Per-day totals from the rollup plus live time of running entries.
+
+    user_ids: users to report on; None reads every user with data.
+    running: already loaded entries to count live; they are queried when None.
+    Returns the same ``{user_id: [DayTotal, ...]}`` shape as daily_totals().
+    """
+    range_end = day_start(end_date) + timedelta(days=1)
+    totals_q = db.select(DailyTotal.user_id, DailyTotal.date, DailyTotal.seconds).where(
+        DailyTotal.date >= start_date,
+        DailyTotal.date <= end_date,
+    )
+    running_q = db.select(TimeEntry.user_id, TimeEntry.start_time, TimeEntry.end_time).where(
+        TimeEntry.end_time == None,
+        TimeEntry.start_time < range_end,
+    )
+    if user_ids is not None:
+        totals_q = totals_q.where(DailyTotal.user_id.in_(user_ids))
+        running_q = running_q.where(TimeEntry.user_id.in_(user_ids))
+    base = db.session.execute(totals_q).all()
+    if running is None:
+        running = db.session.execute(running_q).all()
+    else:
+        running = [e for e in running if e.end_time is None]
+    return daily_totals(running, start_date, end_date, adjustments, user_ids=user_ids or (),
+                        now=now or datetime.utcnow(), base=base)
@@ -0,0 +1,88 @@
+"""Idempotent schema upgrade for existing databases.
+
+db.create_all() only creates missing tables; it does not add columns or
+indexes to tables that already exist, and the DailyTotal rollup starts out
+empty. The gunicorn master runs upgrade() once on start-up (DB_UPGRADE_ON_START) and
+upgrade_db.py runs it by hand, so a deploy brings an old database up to date
+without remembering the separate migration scripts. Every step checks first
+and is safe to repeat.
+"""
+import logging
+
+from sqlalchemy import inspect, text
+
+from .models import db, User, TimeEntry, DailyTotal
+from .rollup import rebuild
+
+logger = logging.getLogger(__name__)
+
+
+# Columns added to existing tables after their first release; create_all() skips them.
+# Each needs a server default so the ALTER TABLE works on tables that already have rows.
+ADDED_COLUMNS = (
+    User.__table__.c.session_version,
+)
+
+
+def ensure_columns():
+    """Add the ADDED_COLUMNS that are missing. Returns the names of the added ones."""
+    inspector = inspect(db.engine)
+    quote = db.engine.dialect.identifier_preparer.quote
+    added = []
+    for column in ADDED_COLUMNS:
+        table = column.table.name
+        if column.name in {c['name'] for c in inspector.get_columns(table)}:
+            continue
+        ddl = f"ALTER TABLE {quote(table)} ADD COLUMN {quote(column.name)} {column.type.compile(db.engine.dialect)}"
+        if column.server_default is not None:
+            ddl += f" DEFAULT {column.server_default.arg}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+        db.session.execute(text(ddl))
+        db.session.commit()
+        added.append(f"{table}.{column.name}")
+    return added
+
+
+def ensure_indexes():
+    """Create the time-entry and RFID indexes that are missing. Returns their names.
+
+    Creating uq_time_entry_running fails if a user already has several running
+    entries; that is logged and the other indexes are still created.
+    """
+    # Replaced by the unique uq_time_entry_running
+    try:
+        db.session.execute(text("DROP INDEX IF EXISTS ix_time_entry_running"))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Dropping old index ix_time_entry_running failed: {e}")
+    ensured = []
+    for table in (TimeEntry.__table__, User.__table__):
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            try:
+                index.create(db.engine, checkfirst=True)
+                ensured.append(index.name)
+            except Exception as e:
+                logger.warning(f"Creating index {index.name} on {table.name} failed: {e}")
+    return ensured
+
+
+def backfill_daily_totals():
+    """Fill DailyTotal from the closed entries if it is still empty. Returns rows written."""
+    if db.session.execute(db.select(DailyTotal.id).limit(1)).first() is not None:
+        return 0
+    if db.session.execute(db.select(TimeEntry.id).where(TimeEntry.end_time != None).limit(1)).first() is None:
+        return 0
+    return rebuild()
+
+
+def upgrade():
+    """Create missing tables, columns and indexes and backfill the rollup. Needs an app context."""
+    db.create_all()
+    columns = ensure_columns()
+    indexes = ensure_indexes()
+    rows = backfill_daily_totals()
+    logger.info(f"Schema upgrade: tables ok, columns added {columns or 'none'}, "
+                f"{len(indexes)} indexes ok, {rows} daily total rows backfilled")
+    return columns, indexes, rows
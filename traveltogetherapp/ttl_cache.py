@@ -0,0 +1,71 @@
+"""Bounded, thread-safe LRU cache with a TTL, shared by the in-process caches.
+
+Each entry expires ``ttl`` seconds after it was stored, and beyond
+``max_size`` entries the least recently used one is evicted. A size or TTL
+of 0 disables caching. rfid_cache and user_cache build on it; subclasses
+that keep a secondary index follow every insert and removal through the
+_added/_removed hooks.
+"""
+from collections import OrderedDict
+import threading
+import time
+
+
+class TTLCache:
+    """Bounded, thread-safe LRU cache of key -> item with a TTL."""
+
+    def __init__(self, max_size=1024, ttl=30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires, item), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            expires, item = hit
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return item
+
+    def put(self, key, item):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._remove(key)
+            self._added(key, item)
+            self._data[key] = (time.monotonic() + self.ttl, item)
+            while len(self._data) > self.max_size:
+                self._remove(next(iter(self._data)))
+
+    def invalidate(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._cleared()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _remove(self, key):
+        """Drop ``key`` if present. Called with the lock held."""
+        hit = self._data.pop(key, None)
+        if hit is not None:
+            self._removed(key, hit[1])
+
+    # Hooks for subclasses, called with the lock held
+    def _added(self, key, item):
+        pass
+
+    def _removed(self, key, item):
+        pass
+
+    def _cleared(self):
+        pass
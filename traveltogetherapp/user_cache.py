@@ -0,0 +1,53 @@
+"""Short-lived cache of the logged-in user behind the login manager.
+
+Every authenticated request resolves ``current_user`` from the session. The
+pages only need id, email, alias, role and rfid, so a slim copy of those is
+kept for ``USER_CACHE_TTL`` seconds instead of loading the User row each
+time. Writes to a user's profile, role or password drop the entry; the TTL
+bounds how long another worker process can serve the old values.
+"""
+from flask_login import UserMixin
+
+from .ttl_cache import TTLCache
+
+
+class SessionUser(UserMixin):
+    """Read-only stand-in for User as ``current_user``.
+
+    Routes that change the user load the full row with db.session.get().
+    login_id is User.get_id() (see models.session_id); the password hash
+    itself is not kept.
+    """
+    __slots__ = ("id", "email", "alias", "role", "rfid", "login_id")
+
+    def __init__(self, id, email, alias, role, rfid, login_id):
+        self.id = id
+        self.email = email
+        self.alias = alias
+        self.role = role
+        self.rfid = rfid
+        self.login_id = login_id
+
+    def get_id(self):
+        return self.login_id
+
+    def is_editor(self):
+        return (self.role or 'user') in ('editor', 'admin')
+
+    def is_authority(self):
+        return (self.role or 'user') in ('authority', 'admin')
+
+
+class UserCache(TTLCache):
+    """Bounded, thread-safe LRU cache of user_id -> SessionUser with a TTL."""
+
+    def init_app(self, app):
+        self.max_size = app.config.get("USER_CACHE_SIZE", self.max_size)
+        self.ttl = app.config.get("USER_CACHE_TTL", self.ttl)
+        self.clear()
+
+    def put(self, item):
+        super().put(item.id, item)
+
+
+user_cache = UserCache()
@@ -0,0 +1,59 @@
+"""Start-up warm-up and readiness for scale-to-zero machines.
+
+A machine woken by the first badge scan would otherwise compile the Jinja
+templates and open its first database connection while that request waits.
+The gunicorn hooks call these once per process before traffic arrives, and
+/ready reports whether the database answers so the proxy only routes to a
+machine that can serve.
+"""
+import logging
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from .models import db
+
+logger = logging.getLogger(__name__)
+
+
+def warm_templates(app):
+    """Compile every HTML template into the Jinja cache. Returns the count."""
+    names = [n for n in app.jinja_env.list_templates() if n.endswith('.html')]
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def warm_db(app, connections=1):
+    """Open ``connections`` pooled database connections. Returns True on success."""
+    with app.app_context():
+        try:
+            conns = [db.engine.connect() for _ in range(connections)]
+            for conn in conns:
+                conn.execute(text('SELECT 1'))
+            for conn in conns:
+                conn.close()  # back to the pool, still open
+            return True
+        except SQLAlchemyError as e:
+            logger.warning(f"Database warm-up failed: {e}")
+            return False
+
+
+def warm_up(app, templates=True, connections=1):
+    started = time.perf_counter()
+    count = warm_templates(app) if templates else 0
+    ok = warm_db(app, connections) if connections else True
+    logger.info(f"Warm-up: {count} templates, db {'ok' if ok else 'unavailable'} "
+                f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return ok
+
+
+def database_ready():
+    """True if the database answers a trivial query (used by /ready)."""
+    try:
+        db.session.execute(text('SELECT 1'))
+        return True
+    except SQLAlchemyError:
+        db.session.rollback()
+        return False
@@ -0,0 +1,135 @@
+"""Cached role policy backed by whitelist.txt.
+
+The whitelist is parsed once into a set and only re-read when the file's
+mtime changes (checked at most every ``WHITELIST_CHECK_INTERVAL`` seconds)
+or when an admin asks for a reload, so role lookups during registration
+are a set membership test. The file is part of the deployed image; edit it
+(or run import_whitelist.py) in the source tree and redeploy.
+"""
+from collections import namedtuple
+import os
+import re
+import threading
+import time
+
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+DEFAULT_HEADER = "# One email per line. Users with these emails will get 'editor' role on registration.\n"
+
+# count: emails in the policy afterwards; rejected: import lines without an email address
+ImportResult = namedtuple("ImportResult", "count rejected")
+
+
+def parse_emails(lines, rejected=None):
+    """Extract lower-cased emails from whitelist lines or CSV rows (e.g. an HR export).
+
+    Blank lines and ``#`` comments are skipped; for CSV rows the first field
+    that looks like an email address is used. A line without one is kept as
+    it is (whitelist.txt has always been matched line by line), or, when a
+    ``rejected`` list is given, appended to it instead.
+    """
+    emails = set()
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        for field in re.split(r"[,;\t]", line):
+            field = field.strip().strip('"').lower()
+            if EMAIL_RE.match(field):
+                emails.add(field)
+                break
+        else:
+            if rejected is None:
+                emails.add(line.lower())
+            else:
+                rejected.append(line)
+    return emails
+
+
+class RolePolicy:
+    """Maps emails to the role they get on registration."""
+
+    def __init__(self, path=None, check_interval=5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._editors = frozenset()
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        self.path = app.config.get("WHITELIST_PATH") or os.path.join(root_dir, 'whitelist.txt')
+        self.check_interval = app.config.get("WHITELIST_CHECK_INTERVAL", self.check_interval)
+        self.reload()
+
+    def reload(self):
+        """Re-read the whitelist file. Returns the number of editor emails."""
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    editors = frozenset(parse_emails(f))
+            except OSError:
+                mtime, editors = None, frozenset()
+            self._editors = editors
+            self._mtime = mtime
+            self._checked_at = time.monotonic()
+            return len(editors)
+
+    def _refresh_if_changed(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            self.reload()
+
+    def role_for(self, email):
+        """Role a newly registered user with this email should get."""
+        self._refresh_if_changed()
+        return 'editor' if (email or '').strip().lower() in self._editors else 'user'
+
+    def editors(self):
+        """Sorted editor emails, for the admin page."""
+        self._refresh_if_changed()
+        return sorted(self._editors)
+
+    def _comments(self):
+        """Comment lines of the current whitelist file, to keep them when it is rewritten."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return [line.rstrip('\n') + '\n' for line in f if line.strip().startswith('#')]
+        except OSError:
+            return []
+
+    def bulk_import(self, lines, replace=False):
+        """Add (or with replace=True, set) editor emails and persist them to the file.
+
+        Only used by import_whitelist.py before an image is built: the file
+        ships with the app, so writes inside a running container would be
+        lost on the next deploy. Returns an ImportResult. Raises ValueError if replace=True and the
+        input has no email addresses, rather than emptying the whitelist.
+        """
+        rejected = []
+        emails = parse_emails(lines, rejected)
+        if replace and not emails:
+            raise ValueError("No email addresses found; the whitelist was left unchanged.")
+        with self._lock:
+            editors = emails if replace else set(self._editors) | emails
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.writelines(self._comments() or [DEFAULT_HEADER])
+                for email in sorted(editors):
+                    f.write(email + '\n')
+            os.replace(tmp, self.path)
+        return ImportResult(self.reload(), rejected)
+
+    def __len__(self):
+        return len(self._editors)
+
+
+role_policy = RolePolicy()
@@ -0,0 +1,25 @@
+"""
+Bring an existing database up to the current schema.
+
+Usage:
+  python upgrade_db.py
+
+Creates the missing tables (daily_total, processed_scan, device_token, ...),
+columns (user.session_version) and indexes, and fills the DailyTotal rollup
+if it is still empty. Safe to run more than once. gunicorn runs the same
+upgrade on start-up unless DB_UPGRADE_ON_START=0, so this is only needed for
+`python app.py` or when that is switched off. Works on a fresh database too (instead of init_db.py).
+"""
+from traveltogetherapp import create_app
+from traveltogetherapp.schema import upgrade
+
+if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        columns, indexes, rows = upgrade()
+        print('Ensured all tables.')
+        for name in columns:
+            print(f'Added column {name}.')
+        for name in indexes:
+            print(f'Ensured index {name}.')
+        print(f'Backfilled {rows} daily total rows.')